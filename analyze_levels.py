@@ -0,0 +1,225 @@
+# analyze_levels.py - Check generated levels for unreachable gaps across many seeds
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import main
+
+DIFFICULTY_BINS = 10
+
+def rect_round(v):
+    # pygame.Rect rounds float assignments half away from zero
+    return math.floor(v + 0.5) if v >= 0 else -math.floor(-v + 0.5)
+
+def jump_profile(takeoff_y, target_top):
+    """Simulate the vertical part of a jump exactly as Player.apply_gravity does.
+
+    Returns (t_enter, t_exit, t_land): the first tick the player's body overlaps
+    the target's band, the first tick its feet clear the target's top, and the
+    tick it lands on the target; any of them may be None.
+    """
+    y = top = takeoff_y - main.PLAYER_HEIGHT
+    vel_y = main.JUMP_FORCE
+    target_bottom = target_top + 20
+    t_enter = t_exit = None
+    tick = 0
+    while True:
+        tick += 1
+        vel_y += main.GRAVITY
+        y += vel_y
+        top = rect_round(y)
+        feet = top + main.PLAYER_HEIGHT
+
+        if vel_y < 0:
+            if t_enter is None and top < target_bottom and feet > target_top:
+                t_enter = tick
+            if t_exit is None and feet <= target_top:
+                t_exit = tick
+        elif feet > target_top:
+            # First tick below the top while falling: land only inside the top half
+            if t_exit is not None and feet <= target_top + 10:
+                return t_enter, t_exit, tick
+            return t_enter, t_exit, None
+
+class JumpTable:
+    """Caches jump_profile by rise, for jumps that stay on one side of y = 0."""
+
+    def __init__(self):
+        self.cache = {}
+
+    def profile(self, takeoff_y, target_top):
+        # The rounding rule is sign dependent, so only reuse results for jumps
+        # that never cross y = 0
+        if takeoff_y - 300 >= 0:
+            key = (takeoff_y - target_top, 1)
+        elif takeoff_y + 10 < 0:
+            key = (takeoff_y - target_top, -1)
+        else:
+            return jump_profile(takeoff_y, target_top)
+        result = self.cache.get(key)
+        if result is None:
+            result = jump_profile(takeoff_y, target_top)
+            self.cache[key] = result
+        return result
+
+def gap_difficulty(table, src, dst):
+    """Fraction of the available jump used to get from src to dst (>1 or None if impossible).
+
+    src/dst are (x, y, width, motion). The player has to be clear of dst's
+    side while rising past it, then drift over it before landing.
+    """
+    t_enter, t_exit, t_land = table.profile(src[1], dst[1])
+    if t_land is None:
+        return None
+
+    a_lo, a_hi = main.standing_range(src[0], src[2], src[3])
+    b_lo, b_hi = main.standing_range(dst[0], dst[2], dst[3])
+    speed = main.PLAYER_SPEED
+    drift_ticks = t_land - t_exit
+
+    best = math.inf
+    # Clear the left side at b_lo - 1, or the right side at b_hi + 1
+    for clear_x in (b_lo - 1, b_hi + 1):
+        if clear_x < 0 or clear_x > main.SCREEN_WIDTH - main.PLAYER_WIDTH:
+            continue
+        if a_lo <= clear_x <= a_hi:
+            setup = 0
+        else:
+            setup = min(abs(a_lo - clear_x), abs(a_hi - clear_x))
+        setup_ratio = math.ceil(setup / speed) / t_enter if t_enter else (0 if setup == 0 else math.inf)
+        drift_ratio = 1 / drift_ticks if drift_ticks > 0 else math.inf
+        best = min(best, max(setup_ratio, drift_ratio))
+    return best
+
+def analyze_seed(seed, platforms, table):
+    rng = random.Random(seed)
+    prev = (main.SCREEN_WIDTH // 2 - 50, main.SCREEN_HEIGHT - 50, 100, None)
+    stats = new_stats()
+    first_unreachable = None
+
+    for index in range(platforms):
+        x, y, width, motion, coin_x = main.roll_platform(rng, *prev)
+        cur = (x, y, width, motion)
+        stats["gaps"] += 1
+        stats["moving"] += motion is not None
+        stats["coins"] += coin_x is not None
+
+        difficulty = gap_difficulty(table, prev, cur)
+        if difficulty is None:
+            stats["unreachable_vertical"] += 1
+        elif difficulty > 1:
+            stats["unreachable_horizontal"] += 1
+        else:
+            stats["histogram"][min(DIFFICULTY_BINS - 1, int(difficulty * DIFFICULTY_BINS))] += 1
+            stats["difficulty_sum"] += difficulty
+            if prev[3] is not None or motion is not None:
+                # Reachable only because a platform moves; depends on timing
+                still = gap_difficulty(table, prev[:3] + (None,), cur[:3] + (None,))
+                stats["timing_dependent"] += still is None or still > 1
+
+        if first_unreachable is None and (difficulty is None or difficulty > 1):
+            first_unreachable = index
+        prev = cur
+
+    stats["seeds"] = 1
+    stats["first_unreachable"].append(first_unreachable if first_unreachable is not None else platforms)
+    return stats
+
+def new_stats():
+    return {
+        "seeds": 0,
+        "gaps": 0,
+        "moving": 0,
+        "coins": 0,
+        "unreachable_vertical": 0,
+        "unreachable_horizontal": 0,
+        "timing_dependent": 0,
+        "rerolls": 0,
+        "clamps": 0,
+        "difficulty_sum": 0.0,
+        "histogram": [0] * DIFFICULTY_BINS,
+        "first_unreachable": [],
+    }
+
+def merge_stats(total, part):
+    for key, value in part.items():
+        if key == "histogram":
+            total[key] = [a + b for a, b in zip(total[key], value)]
+        else:
+            total[key] += value
+    return total
+
+def analyze_chunk(args):
+    seeds, platforms, sim_hz = args
+    # Workers may not inherit the parent's module state (spawn start method)
+    main.set_sim_rate(sim_hz)
+    table = JumpTable()
+    total = new_stats()
+    before = dict(main.roll_fallbacks)
+    for seed in seeds:
+        merge_stats(total, analyze_seed(seed, platforms, table))
+    for key, count in before.items():
+        total[key] = main.roll_fallbacks[key] - count
+    return total
+
+def run(seeds=1000, platforms=1000, first_seed=0, workers=None, chunk=16):
+    workers = workers or os.cpu_count() or 1
+    jobs = [(range(start, min(start + chunk, first_seed + seeds)), platforms, main.SIM_HZ)
+            for start in range(first_seed, first_seed + seeds, chunk)]
+
+    total = new_stats()
+    start = time.perf_counter()
+    if workers == 1:
+        for job in jobs:
+            merge_stats(total, analyze_chunk(job))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for part in pool.imap_unordered(analyze_chunk, jobs):
+                merge_stats(total, part)
+    total["seconds"] = time.perf_counter() - start
+    total["workers"] = workers
+    return total
+
+def print_report(stats):
+    gaps = stats["gaps"]
+    unreachable = stats["unreachable_vertical"] + stats["unreachable_horizontal"]
+    reachable = gaps - unreachable
+    print(f"{stats['seeds']} seeds, {gaps} platforms in {stats['seconds']:.2f}s "
+          f"on {stats['workers']} workers ({gaps / max(stats['seconds'], 1e-9):,.0f} platforms/s)")
+    print(f"moving platforms: {stats['moving'] / max(gaps, 1):.1%}, coins: {stats['coins'] / max(gaps, 1):.1%}")
+    print(f"\nunreachable gaps: {unreachable} ({unreachable / max(gaps, 1):.2%})")
+    print(f"  landing window skipped (vertical): {stats['unreachable_vertical']}")
+    print(f"  too far to drift (horizontal):     {stats['unreachable_horizontal']}")
+    print(f"  reachable only via platform motion: {stats['timing_dependent']}")
+    print(f"\nroll_platform fallbacks: {stats['rerolls']} re-rolls, {stats['clamps']} clamped to the nearest reachable x")
+
+    first = sorted(stats["first_unreachable"])
+    if first:
+        print(f"\nplatforms before the first unreachable gap: "
+              f"median {first[len(first) // 2]}, p10 {first[len(first) // 10]}, min {first[0]}")
+
+    if reachable:
+        print(f"\ndifficulty of reachable gaps (share of the jump used), mean {stats['difficulty_sum'] / reachable:.2f}:")
+        for i, count in enumerate(stats["histogram"]):
+            lo, hi = i / DIFFICULTY_BINS, (i + 1) / DIFFICULTY_BINS
+            bar = "#" * round(40 * count / max(stats["histogram"]))
+            print(f"  {lo:.1f}-{hi:.1f} {count:>10} {bar}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-check procedural levels for unreachable platforms.")
+    parser.add_argument("--seeds", type=int, default=1000, help="number of seeds to generate")
+    parser.add_argument("--platforms", type=int, default=1000, help="platforms generated per seed")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk", type=int, default=16, help="seeds per worker task")
+    parser.add_argument("--sim-hz", type=int, default=main.SIM_HZ, help="simulation step rate")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    main.set_sim_rate(args.sim_hz)
+    print_report(run(args.seeds, args.platforms, args.first_seed, args.workers, args.chunk))
@@ -0,0 +1,91 @@
+# bake_assets.py - Render the procedural sprites into one packed atlas for the web build
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+import main
+
+SHEET_WIDTH = 1024
+PADDING = 1
+
+def collect_sprites():
+    """Every sprite the game can ask the atlas for, as (name, surface) pairs.
+
+    Names match the keys main.py looks up: the randomized platform textures and
+    grass frames are seeded by their key, so baking them gives the same pixels
+    the runtime would generate.
+    """
+    atlas = main.PlatformTextureAtlas()
+    sprites = []
+    for bucket in range(main.PLATFORM_WIDTH_RANGE[0], main.PLATFORM_WIDTH_RANGE[1] + 1, atlas.WIDTH_STEP):
+        for platform_type in atlas.TYPES:
+            for variant in range(atlas.VARIANTS):
+                sprites.append((f"platform:{platform_type}:{bucket}:{variant}",
+                                atlas.sprite(platform_type, bucket, variant)))
+        for frame in range(atlas.GRASS_FRAMES):
+            sprites.append((f"grass:{bucket}:{frame}", atlas.grass_frame(bucket, frame)))
+
+    skins = main.SkinRegistry()
+    for name in skins.SKINS:
+        for view, surface in zip(skins.VIEWS, skins.get(name)):
+            sprites.append((f"skin:{name}:{view}", surface))
+
+    main.CoinStore.spin_sprites = None
+    for i, surface in enumerate(main.CoinStore.spin_frames()):
+        sprites.append((f"coin:{i}", surface))
+    main.CoinStore.plain_sprite = None
+    sprites.append(("coin:plain", main.CoinStore.plain_frame()))
+    return sprites
+
+def pack(sprites, sheet_width=SHEET_WIDTH, padding=PADDING):
+    """Shelf-pack sprites tallest first; returns ({name: (x, y, w, h)}, sheet height)."""
+    rects = {}
+    x = y = shelf_height = 0
+    for name, surface in sorted(sprites, key=lambda item: (-item[1].get_height(), item[0])):
+        width, height = surface.get_size()
+        if width > sheet_width:
+            raise ValueError(f"{name} is wider than the {sheet_width}px sheet")
+        if x + width > sheet_width:
+            x, y = 0, y + shelf_height + padding
+            shelf_height = 0
+        rects[name] = (x, y, width, height)
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+    return rects, y + shelf_height
+
+def bake(image_path=main.ATLAS_IMAGE, index_path=main.ATLAS_INDEX):
+    # Generate from scratch even if an older atlas is lying around
+    main.baked_atlas.clear()
+    sprites = collect_sprites()
+    rects, height = pack(sprites)
+
+    sheet = pygame.Surface((SHEET_WIDTH, height), pygame.SRCALPHA)
+    for name, surface in sprites:
+        sheet.blit(surface, rects[name][:2])
+
+    for path in (image_path, index_path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    pygame.image.save(sheet, image_path)
+    with open(index_path, 'w') as f:
+        json.dump({"fingerprint": main.BakedAtlas.fingerprint(), "sprites": rects}, f, sort_keys=True)
+    return len(sprites), sheet.get_size()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bake procedural sprites into a packed atlas and index.")
+    parser.add_argument("--image", default=main.ATLAS_IMAGE, help="atlas PNG to write")
+    parser.add_argument("--index", default=main.ATLAS_INDEX, help="atlas index JSON to write")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    pygame.init()
+    start = time.perf_counter()
+    count, (width, height) = bake(args.image, args.index)
+    print(f"baked {count} sprites into {args.image} ({width}x{height}) "
+          f"and {args.index} in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,428 @@
+# batch_sim.py - Step thousands of agents through one generated level with NumPy
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import headless
+import main
+
+def rect_round(v):
+    # pygame.Rect rounds float assignments half away from zero (C round())
+    t = np.trunc(v)
+    return (t + np.where(np.abs(v - t) >= 0.5, np.sign(v), 0)).astype(np.int64)
+
+def start_platform():
+    return (main.SCREEN_WIDTH // 2 - 50, main.SCREEN_HEIGHT - 50, 100)
+
+def level_changes(ys, lead_scroll, trail_scroll):
+    """(platforms to cull from the front, platforms to add) for the shared level.
+
+    Game culls below its camera and keeps MAX_PLATFORMS alive. With many
+    agents a platform goes once it is below the lowest camera, and new ones
+    come while the highest camera has fewer than MAX_PLATFORMS ahead; for a
+    single agent that is exactly Game's rule.
+    """
+    cutoff = main.SCREEN_HEIGHT + 200
+    cull = 0
+    while cull < len(ys) and ys[cull] - trail_scroll >= cutoff:
+        cull += 1
+    ahead = sum(1 for y in ys[cull:] if y - lead_scroll < cutoff)
+    return cull, max(0, main.MAX_PLATFORMS - ahead)
+
+class BatchLevel:
+    """One procedurally generated level as platform arrays, in Game's list order."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.frontier = start_platform() + (None,)
+        self.x = np.zeros(0, dtype=np.int64)
+        self.y = np.zeros(0, dtype=np.int64)
+        self.width = np.zeros(0, dtype=np.int64)
+        self.moving = np.zeros(0, dtype=bool)
+        self.move_dir = np.zeros(0, dtype=np.int64)
+        self.speed = np.zeros(0, dtype=np.float64)
+        self.move_dist = np.zeros(0, dtype=np.int64)
+        self.start_x = np.zeros(0, dtype=np.int64)
+        self.pos_x = np.zeros(0, dtype=np.float64)
+        self.add([start_platform() + (None,)])
+
+    def __len__(self):
+        return len(self.x)
+
+    def add(self, specs):
+        columns = {"x": [], "y": [], "width": [], "moving": [], "move_dir": [],
+                   "speed": [], "move_dist": [], "start_x": [], "pos_x": []}
+        for x, y, width, motion in specs:
+            move_dir, speed, move_dist = motion or (0, 0.0, 0)
+            for name, value in (("x", x), ("y", y), ("width", width), ("moving", motion is not None),
+                                ("move_dir", move_dir), ("speed", speed), ("move_dist", move_dist),
+                                ("start_x", x), ("pos_x", x)):
+                columns[name].append(value)
+        for name, values in columns.items():
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate((array, np.array(values, dtype=array.dtype))))
+
+    def roll(self, count):
+        # Same stream as LevelStream: roll_platform continuing from the frontier
+        specs = []
+        for _ in range(count):
+            spec = main.roll_platform(self.rng, *self.frontier)
+            self.frontier = spec[:4]
+            specs.append(spec[:4])
+        return specs
+
+    def cull(self, count):
+        for name in ("x", "y", "width", "moving", "move_dir", "speed", "move_dist", "start_x", "pos_x"):
+            setattr(self, name, getattr(self, name)[count:])
+
+    def update(self):
+        # Platform.update for every moving platform at once
+        m = self.moving
+        self.pos_x[m] += self.speed[m] * self.move_dir[m]
+        self.x[m] = rect_round(self.pos_x[m])
+        turn = m & (np.abs(self.pos_x - self.start_x) > self.move_dist)
+        self.move_dir[turn] *= -1
+
+class BatchAgents:
+    """Player.move / Player.apply_gravity for many players, state held in arrays.
+
+    Like Player, pos_x / pos_y hold the float position and x / y its rect.
+    """
+
+    def __init__(self, count, level):
+        floor_x, floor_y, floor_width = level.x[0], level.y[0], level.width[0]
+        self.count = count
+        self.x = np.full(count, floor_x + floor_width // 2 - main.PLAYER_WIDTH // 2, dtype=np.int64)
+        self.y = np.full(count, floor_y - main.PLAYER_HEIGHT, dtype=np.int64)
+        self.pos_x = self.x.astype(np.float64)
+        self.pos_y = self.y.astype(np.float64)
+        self.vel_y = np.zeros(count, dtype=np.float64)
+        self.jumping = np.ones(count, dtype=bool)
+        self.alive = np.ones(count, dtype=bool)
+        self.scroll = np.zeros(count, dtype=np.int64)
+        self.counts = dict.fromkeys(("landings", "head_bumps", "carried", "clamped"), 0)
+
+    def candidates(self, left, right, top, bottom, level):
+        # The platforms PlatformIndex.query would return for each agent's rect,
+        # plus the columns any agent needs at all
+        hits = ((left[:, None] < (level.x + level.width)[None, :]) &
+                (right[:, None] > level.x[None, :]) &
+                (top[:, None] < (level.y + 20)[None, :]) &
+                (bottom[:, None] > level.y[None, :]) &
+                self.alive[:, None])
+        return hits, np.flatnonzero(hits.any(axis=0))
+
+    def move(self, vel_x, level):
+        w, h = main.PLAYER_WIDTH, main.PLAYER_HEIGHT
+        prev_x = self.x
+        pos_x = np.where(self.alive, self.pos_x + vel_x, self.pos_x)
+        x = np.where(self.alive, rect_round(pos_x), prev_x)
+        y = self.y
+        hits, columns = self.candidates(np.minimum(prev_x, x), np.maximum(prev_x, x) + w, y, y + h, level)
+
+        for j in columns:
+            left, right = level.x[j], level.x[j] + level.width[j]
+            top, bottom = level.y[j], level.y[j] + 20
+            hit = hits[:, j] & (x < right) & (x + w > left) & (y < bottom) & (y + h > top)
+            push_left = hit & (vel_x > 0) & (x + w > left) & (x < left)
+            push_right = hit & ~push_left & (vel_x < 0) & (x < right) & (x + w > right)
+            x = np.where(push_left, left - w, np.where(push_right, right, x))
+            pos_x = np.where(push_left | push_right, x, pos_x)
+
+        clamped = np.clip(pos_x, 0, main.SCREEN_WIDTH - w)
+        self.counts["clamped"] += int(np.count_nonzero(clamped != pos_x))
+        self.pos_x = clamped
+        self.x = np.where(self.alive, rect_round(clamped), x)
+
+    def fall(self, level):
+        w, h = main.PLAYER_WIDTH, main.PLAYER_HEIGHT
+        alive = self.alive
+        vel_y = np.where(alive, self.vel_y + main.GRAVITY, self.vel_y)
+        prev_y = self.y
+        pos_y = np.where(alive, self.pos_y + vel_y, self.pos_y)
+        y = np.where(alive, rect_round(pos_y), prev_y)
+        jumping = self.jumping | alive
+        carry = np.full(self.count, -1, dtype=np.int64)
+        x, pos_x = self.x, self.pos_x
+        # Same broad phase as apply_gravity: the swept rect, 20px taller each way
+        hits, columns = self.candidates(x, x + w, np.minimum(prev_y, y) - 20,
+                                        np.maximum(prev_y, y) + h + 20, level)
+
+        for j in columns:
+            left, right = level.x[j], level.x[j] + level.width[j]
+            top, bottom = level.y[j], level.y[j] + 20
+            centery = top + 10
+            hit = hits[:, j] & (x < right) & (x + w > left) & (y < bottom) & (y + h > top)
+            land = hit & (vel_y >= 0) & (y + h <= centery)
+            bump = hit & ~land & (vel_y < 0) & (y >= centery)
+            y = np.where(land, top - h, np.where(bump, bottom, y))
+            pos_y = np.where(land | bump, y, pos_y)
+            vel_y = np.where(land | bump, 0.0, vel_y)
+            jumping &= ~land
+            if level.moving[j]:
+                carry = np.where(land, j, carry)
+            self.counts["landings"] += int(np.count_nonzero(land))
+            self.counts["head_bumps"] += int(np.count_nonzero(bump))
+
+        carried = np.flatnonzero(carry >= 0)
+        if len(carried):
+            c = carry[carried]
+            x, pos_x = x.copy(), pos_x.copy()
+            pos_x[carried] += level.speed[c] * level.move_dir[c]
+            x[carried] = rect_round(pos_x[carried])
+            self.counts["carried"] += len(carried)
+
+        self.x, self.y, self.pos_x, self.pos_y = x, y, pos_x, pos_y
+        self.vel_y, self.jumping = vel_y, jumping
+        dead = alive & (y > main.SCREEN_HEIGHT + self.scroll)
+        self.alive = alive & ~dead
+
+    def step(self, inputs, level):
+        # Game.update_player for every agent: jump, move, then gravity
+        jump = self.alive & ((inputs & main.INPUT_JUMP) != 0) & ~self.jumping
+        self.vel_y = np.where(jump, float(main.JUMP_FORCE), self.vel_y)
+        self.jumping = self.jumping | jump
+
+        dx = np.where((inputs & main.INPUT_RIGHT) != 0, 1, np.where((inputs & main.INPUT_LEFT) != 0, -1, 0))
+        self.move(dx * main.PLAYER_SPEED, level)
+        self.fall(level)
+
+    def update_camera(self):
+        follow = self.alive & (self.y < main.SCROLL_THRESH + self.scroll)
+        self.scroll = np.where(follow, self.y - main.SCROLL_THRESH, self.scroll)
+
+class BatchSim:
+    """Many agents on one seeded level, stepped in Game.update's order."""
+
+    def __init__(self, seed, agents):
+        self.level = BatchLevel(seed)
+        self.agents = BatchAgents(agents, self.level)
+        self.update_level()
+
+    def update_level(self):
+        alive = self.agents.alive
+        # Once everyone is dead the level still moves on with the last cameras
+        scroll = self.agents.scroll[alive] if alive.any() else self.agents.scroll
+        cull, missing = level_changes(self.level.y.tolist(), scroll.min(), scroll.max())
+        self.level.cull(cull)
+        if missing:
+            self.level.add(self.level.roll(missing))
+
+    def step(self, inputs):
+        self.agents.step(inputs, self.level)
+        self.level.update()
+        self.update_level()
+        self.agents.update_camera()
+
+class ReferenceSim:
+    """The same world built from Player, Platform and PlatformIndex, one agent at a time."""
+
+    def __init__(self, seed, agents):
+        self.rng = random.Random(seed)
+        self.fx_rng = random.Random(0)
+        self.frontier = start_platform() + (None,)
+        self.platforms = []
+        self.index = main.PlatformIndex()
+        self.add_platform(start_platform())
+        floor = self.platforms[0].rect
+        self.players = []
+        for _ in range(agents):
+            player = main.Player(main.SCREEN_WIDTH // 2, main.SCREEN_HEIGHT - 100, self.fx_rng)
+            player.stand_on(floor)
+            self.players.append(player)
+        self.alive = [True] * agents
+        self.scrolls = [[0, 0] for _ in range(agents)]
+        self.update_level()
+
+    def add_platform(self, spec, motion=None):
+        platform = main.Platform(*spec, motion, self.fx_rng)
+        self.platforms.append(platform)
+        self.index.insert(platform)
+
+    def update_level(self):
+        scrolls = [s[1] for s, alive in zip(self.scrolls, self.alive) if alive] or [s[1] for s in self.scrolls]
+        cull, missing = level_changes([p.rect.y for p in self.platforms], min(scrolls), max(scrolls))
+        for platform in self.platforms[:cull]:
+            self.index.remove(platform)
+        del self.platforms[:cull]
+        for _ in range(missing):
+            x, y, width, motion, _ = main.roll_platform(self.rng, *self.frontier)
+            self.frontier = (x, y, width, motion)
+            self.add_platform((x, y, width), motion)
+
+    def step(self, inputs):
+        for i, player in enumerate(self.players):
+            if not self.alive[i]:
+                continue
+            bits = int(inputs[i])
+            if bits & main.INPUT_JUMP:
+                player.jump()
+            dx = 0
+            if bits & main.INPUT_LEFT:
+                dx = -1
+            if bits & main.INPUT_RIGHT:
+                dx = 1
+            player.move(dx, self.index)
+            if player.apply_gravity(self.index, self.scrolls[i]):
+                self.alive[i] = False
+
+        for platform in self.platforms:
+            if platform.is_moving:
+                platform.update()
+                self.index.update(platform)
+        self.update_level()
+
+        for i, player in enumerate(self.players):
+            if self.alive[i] and player.rect.top < main.SCROLL_THRESH + self.scrolls[i][1]:
+                self.scrolls[i][1] = player.rect.top - main.SCROLL_THRESH
+
+class RandomInputs:
+    """Vectorized random policy: wander, re-rolling direction now and then, and jump when able."""
+
+    def __init__(self, agents, seed=0, turn_chance=0.05):
+        self.rng = np.random.default_rng(seed)
+        self.turn_chance = turn_chance
+        self.direction = self.rng.integers(0, 3, agents)
+
+    def __call__(self, agents):
+        turn = self.rng.random(len(self.direction)) < self.turn_chance
+        self.direction[turn] = self.rng.integers(0, 3, int(turn.sum()))
+        steer = np.array((0, main.INPUT_LEFT, main.INPUT_RIGHT))[self.direction]
+        return steer | np.where(agents.jumping, 0, main.INPUT_JUMP)
+
+def first_mismatch(batch, reference):
+    agents = batch.agents
+    state = {
+        "x": (agents.x, [p.rect.x for p in reference.players]),
+        "y": (agents.y, [p.rect.y for p in reference.players]),
+        "pos_x": (agents.pos_x, [p.x for p in reference.players]),
+        "pos_y": (agents.pos_y, [p.y for p in reference.players]),
+        "vel_y": (agents.vel_y, [p.vel_y for p in reference.players]),
+        "jumping": (agents.jumping, [p.jumping for p in reference.players]),
+        "alive": (agents.alive, reference.alive),
+        "scroll": (agents.scroll, [s[1] for s in reference.scrolls]),
+    }
+    for name, (got, want) in state.items():
+        bad = np.flatnonzero(got != np.array(want))
+        if len(bad):
+            i = bad[0]
+            return f"agent {i} {name}: batch {got[i]} != Player {want[i]}"
+    platforms = [p.rect.x for p in reference.platforms]
+    if batch.level.x.tolist() != platforms or batch.level.y.tolist() != [p.rect.y for p in reference.platforms]:
+        return "platforms differ"
+    return None
+
+def noisy_climbers(reference, policies, rng, tick, noise=0.1):
+    # headless.ClimberPolicy per agent, with some ticks swapped for random input
+    # so the agents spread out over the level
+    inputs = np.zeros(len(policies), dtype=np.int64)
+    for i, (player, policy) in enumerate(zip(reference.players, policies)):
+        if reference.alive[i]:
+            inputs[i] = policy(SimpleNamespace(player=player, platforms=reference.platforms), tick)
+    swap = rng.random(len(inputs)) < noise
+    return np.where(swap, rng.integers(0, 8, len(inputs)), inputs)
+
+def check_player_parity(seed, agents, ticks):
+    # Every agent against its own Player in the same shared world
+    batch = BatchSim(seed, agents)
+    reference = ReferenceSim(seed, agents)
+    policies = [headless.ClimberPolicy() for _ in range(agents)]
+    rng = np.random.default_rng(seed)
+    for tick in range(ticks):
+        if not batch.agents.alive.any():
+            break
+        inputs = noisy_climbers(reference, policies, rng, tick)
+        batch.step(inputs)
+        reference.step(inputs)
+        mismatch = first_mismatch(batch, reference)
+        if mismatch:
+            return tick + 1, mismatch, batch.agents.counts
+    return tick + 1, None, batch.agents.counts
+
+def check_game_parity(seed, ticks):
+    # One agent against a real Game run; also covers the level spawn rule
+    game = main.Game(persist=False)
+    game.reset(seed)
+    game.state = "playing"
+    policy = headless.ClimberPolicy()
+    batch = BatchSim(seed, 1)
+    for tick in range(ticks):
+        if game.state != "playing":
+            break
+        inputs = policy(game, tick)
+        game.update(inputs)
+        batch.step(np.array([inputs]))
+        agents = batch.agents
+        got = (int(agents.x[0]), int(agents.y[0]), float(agents.vel_y[0]), bool(agents.alive[0]), int(agents.scroll[0]))
+        want = (game.player.rect.x, game.player.rect.y, float(game.player.vel_y),
+                game.state == "playing", game.scroll[1])
+        if got != want:
+            return tick + 1, f"batch (x, y, vel_y, alive, scroll) {got} != Game {want}", agents.counts
+        if batch.level.x.tolist() != [p.rect.x for p in game.platforms]:
+            return tick + 1, "platforms differ from Game", agents.counts
+    return tick + 1, None, batch.agents.counts
+
+def run_parity(seeds=3, agents=64, ticks=3000, first_seed=0):
+    main.init_display(headless=True)
+    ok = True
+    for seed in range(first_seed, first_seed + seeds):
+        for label, (steps, mismatch, counts) in (
+                ("Game", check_game_parity(seed, ticks)),
+                (f"{agents} x Player", check_player_parity(seed, agents, ticks))):
+            ok &= mismatch is None
+            result = "identical" if mismatch is None else f"MISMATCH at tick {steps}: {mismatch}"
+            events = ", ".join(f"{name} {count}" for name, count in counts.items())
+            print(f"seed {seed:>4} vs {label:<12} {steps:>6} ticks  {result}  ({events})")
+    return ok
+
+def run_benchmark(agents=4096, ticks=3000, seed=0):
+    sim = BatchSim(seed, agents)
+    policy = RandomInputs(agents, seed)
+    agent_ticks = 0
+    start = time.perf_counter()
+    for tick in range(ticks):
+        alive = int(np.count_nonzero(sim.agents.alive))
+        if not alive:
+            break
+        agent_ticks += alive
+        sim.step(policy(sim.agents))
+    elapsed = time.perf_counter() - start
+    return {
+        "agents": agents,
+        "ticks": tick + 1,
+        "agent_ticks": agent_ticks,
+        "seconds": elapsed,
+        "alive": int(np.count_nonzero(sim.agents.alive)),
+        "best_climb": int(-sim.agents.scroll.min()),
+        "counts": sim.agents.counts,
+    }
+
+def print_report(report):
+    print(f"{report['agents']} agents, {report['ticks']} ticks, {report['agent_ticks']} agent-ticks "
+          f"in {report['seconds']:.2f}s = {report['agent_ticks'] / max(report['seconds'], 1e-9):,.0f} agent-ticks/s")
+    print(f"alive at the end: {report['alive']}, best climb: {report['best_climb']}px")
+    print("events: " + ", ".join(f"{name} {count}" for name, count in report["counts"].items()))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate many agents on one level with a batched physics kernel.")
+    parser.add_argument("--agents", type=int, default=4096, help="agents stepped together")
+    parser.add_argument("--ticks", type=int, default=3000, help="tick limit")
+    parser.add_argument("--seed", type=int, default=0, help="level seed (first seed with --parity)")
+    parser.add_argument("--sim-hz", type=int, default=main.SIM_HZ, help="simulation step rate")
+    parser.add_argument("--parity", action="store_true", help="check trajectories against Player and Game instead")
+    parser.add_argument("--seeds", type=int, default=3, help="seeds checked with --parity")
+    parser.add_argument("--parity-agents", type=int, default=64, help="agents checked against Player with --parity")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    main.set_sim_rate(args.sim_hz)
+    if args.parity:
+        sys.exit(0 if run_parity(args.seeds, args.parity_agents, args.ticks, args.seed) else 1)
+    print_report(run_benchmark(args.agents, args.ticks, args.seed))
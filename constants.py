@@ -0,0 +1,8 @@
+# constants.py - Settings shared by the game and its tools, kept free of pygame
+# so services like leaderboard.py can import them without loading the game
+
+LEADERBOARD_HOST = "127.0.0.1"
+LEADERBOARD_PORT = 8765
+
+# Keys of SkinRegistry.SKINS in main.py, which holds how each one is drawn
+SKIN_NAMES = ("bach", "default", "classic", "ninja", "robot", "wizard")
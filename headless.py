@@ -0,0 +1,203 @@
+# headless.py - Run the game simulation without a window, as fast as it will go
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+import main
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def steer(rect, x):
+    if x < rect.x - 2:
+        return main.INPUT_LEFT
+    if x > rect.x + 2:
+        return main.INPUT_RIGHT
+    return 0
+
+class ClimberPolicy:
+    """Simple bot: climb to the nearest platform above, taking off from beside it."""
+
+    def __init__(self):
+        self.target = None
+        self.ground = None
+        self.takeoff = 0
+
+    def __call__(self, game, tick):
+        player = game.player
+        rect = player.rect
+
+        if player.jumping and self.target is not None:
+            # Keep aiming at the platform chosen at takeoff
+            if rect.bottom <= self.target.rect.top:
+                return steer(rect, self.target.rect.centerx - rect.width // 2)
+            if player.vel_y > 0:
+                return steer(rect, self.ground.rect.centerx - rect.width // 2)
+            return steer(rect, self.takeoff)
+
+        above = [p for p in game.platforms if p.rect.top < rect.bottom - 5]
+        ground = [p for p in game.platforms
+                  if p.rect.top == rect.bottom and p.rect.right > rect.left and p.rect.left < rect.right]
+        if not above or not ground:
+            return 0
+
+        self.target = max(above, key=lambda p: p.rect.top)
+        self.ground = ground[0]
+        target, floor = self.target.rect, self.ground.rect
+        # Jumping from underneath would bump our head, so line up beside the target
+        if abs(target.left - rect.right) < abs(target.right - rect.left):
+            self.takeoff = target.left - rect.width - 5
+        else:
+            self.takeoff = target.right + 5
+
+        inputs = steer(rect, max(floor.left - rect.width + 8, min(floor.right - 8, self.takeoff)))
+        if not inputs:
+            inputs |= main.INPUT_JUMP
+        return inputs
+
+def random_policy(game, tick):
+    inputs = random.choice((0, main.INPUT_LEFT, main.INPUT_RIGHT))
+    if not game.player.jumping:
+        inputs |= main.INPUT_JUMP
+    return inputs
+
+def idle_policy(game, tick):
+    return 0
+
+POLICIES = {
+    "climber": ClimberPolicy,
+    "random": lambda: random_policy,
+    "idle": lambda: idle_policy,
+}
+
+def run_game(game, profiler, seed, max_ticks, policy):
+    # policy is a POLICIES entry; each game gets a fresh instance
+    policy = policy()
+    random.seed(seed)
+    game.reset(seed)
+    game.state = "playing"
+
+    ticks = 0
+    start = time.perf_counter()
+    while game.state == "playing" and ticks < max_ticks:
+        game.update(policy(game, ticks))
+        profiler.end_frame()
+        ticks += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "seed": seed,
+        "ticks": ticks,
+        "seconds": elapsed,
+        "score": game.score,
+        "coins": game.total_coins,
+        "game_over": game.state == "game_over",
+        "replay": game.replay,
+    }
+
+def run_replay(game, profiler, replay):
+    # Fast-forward a recorded run; gameplay depends only on the seed and inputs
+    game.reset(replay.seed)
+    game.state = "playing"
+
+    ticks = 0
+    start = time.perf_counter()
+    for inputs in replay.inputs():
+        if game.state != "playing":
+            break
+        game.update(inputs)
+        profiler.end_frame()
+        ticks += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "seed": replay.seed,
+        "ticks": ticks,
+        "seconds": elapsed,
+        "score": game.score,
+        "coins": game.total_coins,
+        "game_over": game.state == "game_over",
+        "replay": replay,
+    }
+
+def run_benchmark(games=1, seed=0, max_ticks=10000, policy="climber", trace_memory=False, replay=None):
+    main.init_display(headless=True)
+    if trace_memory:
+        tracemalloc.start()
+
+    game = main.Game(persist=False)
+    # Each tick is one profiler frame; no trace is exported, so don't keep events
+    profiler = main.FrameProfiler(max_events=0)
+    profiler.attach(game)
+    if replay is not None:
+        runs = [run_replay(game, profiler, replay)]
+        policy = "replay"
+    else:
+        runs = [run_game(game, profiler, seed + i, max_ticks, POLICIES[policy]) for i in range(games)]
+    profiler.detach()
+
+    report = {
+        "policy": policy,
+        "runs": runs,
+        "ticks": sum(r["ticks"] for r in runs),
+        "seconds": sum(r["seconds"] for r in runs),
+        "phases": {name: profiler.totals[name] for name in profiler.PHASES if name in profiler.totals},
+        "percentiles": profiler.summary(),
+    }
+    if trace_memory:
+        report["heap_current"], report["heap_peak"] = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    if resource is not None:
+        # ru_maxrss is KiB on Linux
+        report["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return report
+
+def print_report(report):
+    for run in report["runs"]:
+        outcome = "game over" if run["game_over"] else "tick limit"
+        print(f"seed {run['seed']:>6}: {run['ticks']:>8} ticks  score {run['score']:>7}  "
+              f"{run['ticks'] / max(run['seconds'], 1e-9):>10.0f} ticks/s  ({outcome})")
+
+    ticks, seconds = report["ticks"], report["seconds"]
+    print(f"\n{len(report['runs'])} games, {ticks} ticks in {seconds:.3f}s "
+          f"= {ticks / max(seconds, 1e-9):.0f} ticks/s ({report['policy']} policy)")
+
+    print(f"\nper-phase cost (p50/p95/p99 over the last {main.FrameProfiler.HISTORY} ticks):")
+    for name, total in sorted(report["phases"].items(), key=lambda item: -item[1]):
+        share = total / 10 / seconds if seconds else 0
+        p50, p95, p99 = (ms * 1000 for ms in report["percentiles"][name])
+        print(f"  {name:<20} {total * 1000 / max(ticks, 1):>8.2f} us/tick  {share:>5.1f}%  "
+              f"{p50:>7.1f} {p95:>7.1f} {p99:>7.1f} us")
+
+    if "heap_peak" in report:
+        print(f"\npython heap: {report['heap_current'] / 1024:.0f} KiB current, "
+              f"{report['heap_peak'] / 1024:.0f} KiB peak")
+    if "max_rss_kb" in report:
+        print(f"max rss: {report['max_rss_kb'] / 1024:.1f} MiB")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Step Game.update headless with scripted input.")
+    parser.add_argument("--games", type=int, default=5, help="seeded games to run back to back")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--ticks", type=int, default=10000, help="tick limit per game")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="climber")
+    parser.add_argument("--sim-hz", type=int, default=main.SIM_HZ, help="simulation step rate")
+    parser.add_argument("--trace-memory", action="store_true", help="track Python heap with tracemalloc (slow)")
+    parser.add_argument("--replay", metavar="FILE", help="fast-forward a recorded .dldr replay instead of a policy")
+    parser.add_argument("--record", metavar="DIR", help="write each game's replay to DIR/<seed>.dldr")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    replay = main.Replay.load(args.replay) if args.replay else None
+    main.set_sim_rate(replay.sim_hz if replay else args.sim_hz)
+    report = run_benchmark(args.games, args.seed, args.ticks, args.policy, args.trace_memory, replay)
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+        for run in report["runs"]:
+            run["replay"].save(os.path.join(args.record, f"{run['seed']}.dldr"))
+    print_report(report)
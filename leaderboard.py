@@ -0,0 +1,302 @@
+# leaderboard.py - Local high-score service: SQLite in WAL mode behind an asyncio JSON-lines server
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import LEADERBOARD_HOST, LEADERBOARD_PORT, SKIN_NAMES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    coins INTEGER NOT NULL,
+    skin TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    replay_hash TEXT NOT NULL UNIQUE,
+    submitted REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_score ON runs (score DESC, id);
+CREATE INDEX IF NOT EXISTS runs_player_score ON runs (player, score DESC, id);
+"""
+FIELDS = ("player", "score", "coins", "skin", "seed", "replay_hash")
+MAX_TOP = 100
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    # WAL keeps the database consistent on a crash with NORMAL; only the last
+    # few batches could be lost, which a high-score table can live with
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.row_factory = sqlite3.Row
+    return db
+
+def validate(run):
+    missing = [name for name in FIELDS if name not in run]
+    if missing:
+        raise ValueError(f"run is missing {', '.join(missing)}")
+    row = tuple(run[name] for name in FIELDS)
+    player, score, coins, skin, seed, replay_hash = row
+    if not all(isinstance(v, str) and v for v in (player, skin, replay_hash)):
+        raise ValueError("player, skin and replay_hash must be non-empty strings")
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in (score, coins, seed)):
+        raise ValueError("score, coins and seed must be integers")
+    return row
+
+class Leaderboard:
+    """Run results in SQLite; submissions are queued and committed in batches.
+
+    One thread owns the writer connection and another the reader, so top-K
+    queries run against the WAL snapshot while a batch is being written.
+    """
+
+    def __init__(self, path="leaderboard.db"):
+        self.path = path
+        self.pending = []
+        self.waiters = []
+        self.wakeup = asyncio.Event()
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="leaderboard-write")
+        self.reader = ThreadPoolExecutor(1, thread_name_prefix="leaderboard-read")
+        self.write_db = self.writer.submit(self.open_writer).result()
+        self.read_db = self.reader.submit(connect, path).result()
+        self.batches = 0
+        self.task = None
+        self.connections = set()
+
+    def open_writer(self):
+        db = connect(self.path)
+        db.executescript(SCHEMA)
+        return db
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        await self.flush()
+        self.writer.submit(self.write_db.close).result()
+        self.reader.submit(self.read_db.close).result()
+        self.writer.shutdown()
+        self.reader.shutdown()
+
+    async def submit(self, runs):
+        # Resolves once the batch holding these runs has been committed
+        rows = [validate(run) for run in runs]
+        if not rows:
+            return 0
+        done = asyncio.get_running_loop().create_future()
+        self.pending.extend(rows)
+        self.waiters.append((done, len(rows)))
+        self.wakeup.set()
+        return await done
+
+    def insert(self, rows, counts):
+        # One transaction for the batch; returns how many of each submission's
+        # rows were actually stored, in the order of counts
+        now = time.time()
+        accepted = []
+        with self.write_db:
+            start = 0
+            for count in counts:
+                before = self.write_db.total_changes
+                # Resubmitting the same replay is a no-op, so clients can retry freely
+                self.write_db.executemany(
+                    "INSERT OR IGNORE INTO runs (player, score, coins, skin, seed, replay_hash, submitted) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", [row + (now,) for row in rows[start:start + count]])
+                accepted.append(self.write_db.total_changes - before)
+                start += count
+        return accepted
+
+    async def flush(self):
+        loop = asyncio.get_running_loop()
+        while self.pending:
+            rows, waiters = self.pending, self.waiters
+            self.pending, self.waiters = [], []
+            try:
+                accepted = await loop.run_in_executor(self.writer, self.insert, rows, [count for _, count in waiters])
+            except sqlite3.Error as e:
+                for done, _ in waiters:
+                    if not done.done():
+                        done.set_exception(e)
+                continue
+            self.batches += 1
+            for (done, _), count in zip(waiters, accepted):
+                if not done.done():
+                    done.set_result(count)
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            # Let submitters that are already runnable join this batch; any
+            # that arrive while it commits go into the next one
+            await asyncio.sleep(0)
+            await self.flush()
+
+    def query(self, sql, args):
+        return [dict(row) for row in self.read_db.execute(sql, args)]
+
+    async def top(self, k=10):
+        k = max(1, min(int(k), MAX_TOP))
+        return await asyncio.get_running_loop().run_in_executor(
+            self.reader, self.query,
+            "SELECT player, score, coins, skin, seed, replay_hash FROM runs ORDER BY score DESC, id LIMIT ?", (k,))
+
+    async def best(self, player):
+        rows = await asyncio.get_running_loop().run_in_executor(
+            self.reader, self.query,
+            "SELECT player, score, coins, skin, seed, replay_hash FROM runs "
+            "WHERE player = ? ORDER BY score DESC, id LIMIT 1", (player,))
+        return rows[0] if rows else None
+
+async def handle_request(board, request):
+    op = request.get("op")
+    if op == "submit":
+        return {"accepted": await board.submit(request["runs"])}
+    if op == "top":
+        return {"top": await board.top(request.get("k", 10))}
+    if op == "best":
+        return {"best": await board.best(request["player"])}
+    raise ValueError(f"unknown op {op!r}")
+
+async def serve_client(board, reader, writer):
+    # One JSON object per line each way
+    board.connections.add(asyncio.current_task())
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                reply = await handle_request(board, json.loads(line))
+            except (ValueError, KeyError, TypeError, sqlite3.Error) as e:
+                reply = {"error": str(e)}
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        board.connections.discard(asyncio.current_task())
+
+async def start_server(path, host=LEADERBOARD_HOST, port=LEADERBOARD_PORT):
+    board = Leaderboard(path)
+    board.start()
+    server = await asyncio.start_server(lambda r, w: serve_client(board, r, w), host, port)
+    return board, server
+
+async def serve(path, host, port):
+    board, server = await start_server(path, host, port)
+    print(f"leaderboard on {host}:{port}, database {path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await board.close()
+
+async def request(host, port, message):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+        return json.loads(await reader.readline())
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+def fake_run(rng, players):
+    return {
+        "player": f"player{rng.randrange(players)}",
+        "score": rng.randrange(10000),
+        "coins": rng.randrange(500),
+        "skin": rng.choice(SKIN_NAMES),
+        "seed": rng.randrange(2**63),
+        "replay_hash": f"{rng.getrandbits(160):040x}",
+    }
+
+async def load_test(path, clients=50, runs=20000, per_request=1, players=1000, queries=1000):
+    """Hammer an in-process server on a free port; returns throughput figures."""
+    board, server = await start_server(path, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    rng = random.Random(0)
+    work = [fake_run(rng, players) for _ in range(runs)]
+
+    async def client(share):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for i in range(0, len(share), per_request):
+            writer.write(json.dumps({"op": "submit", "runs": share[i:i + per_request]}).encode() + b"\n")
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+        writer.close()
+        await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(work[i::clients]) for i in range(clients)))
+    submit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(queries):
+        if i % 2:
+            await request("127.0.0.1", port, {"op": "top", "k": 10})
+        else:
+            await request("127.0.0.1", port, {"op": "best", "player": f"player{i % players}"})
+    query_seconds = time.perf_counter() - start
+
+    batches = board.batches
+    server.close()
+    # The clients have hung up; let their handlers see it before shutting down
+    if board.connections:
+        await asyncio.wait(board.connections, timeout=1)
+    await server.wait_closed()
+    await board.close()
+    return {
+        "runs": runs,
+        "clients": clients,
+        "submit_seconds": submit_seconds,
+        "batches": batches,
+        "queries": queries,
+        "query_seconds": query_seconds,
+    }
+
+def print_load_report(report):
+    print(f"{report['runs']} submissions from {report['clients']} clients in {report['submit_seconds']:.2f}s "
+          f"= {report['runs'] / max(report['submit_seconds'], 1e-9):,.0f}/s "
+          f"({report['batches']} batches, {report['runs'] / max(report['batches'], 1):.0f} runs/batch)")
+    print(f"{report['queries']} top-K / per-player best queries in {report['query_seconds']:.2f}s "
+          f"= {report['query_seconds'] * 1000 / max(report['queries'], 1):.2f} ms each, connection included")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run, query or load-test the local leaderboard service.")
+    parser.add_argument("--db", default="leaderboard.db", help="SQLite database file")
+    parser.add_argument("--host", default=LEADERBOARD_HOST)
+    parser.add_argument("--port", type=int, default=LEADERBOARD_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run the service")
+    top = commands.add_parser("top", help="print the top runs from a running service")
+    top.add_argument("-k", type=int, default=10)
+    load = commands.add_parser("loadtest", help="submit fake runs to an in-process service")
+    load.add_argument("--clients", type=int, default=50)
+    load.add_argument("--runs", type=int, default=20000)
+    load.add_argument("--per-request", type=int, default=1, help="runs per submit request")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.db, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "top":
+        reply = asyncio.run(request(args.host, args.port, {"op": "top", "k": args.k}))
+        for rank, run in enumerate(reply.get("top", []), 1):
+            print(f"{rank:>3}. {run['score']:>7}  {run['player']:<20} {run['coins']:>5} coins  {run['skin']}")
+    else:
+        print_load_report(asyncio.run(load_test(args.db, args.clients, args.runs, args.per_request)))
@@ -1,33 +1,76 @@
 # main.py - Full 800+ line web-ready version
 import pygame
+import os
 import random
 import json
 import math
 import asyncio
+import base64
+import hashlib
+import itertools
+import queue
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pygame import gfxdraw
+
 try:
-    import js
-    js.window.loadingManager.complete()
-except:
-    pass
+    import numpy as np
+except ImportError:
+    # Only frame capture needs it, and the pygbag web build may not have it
+    np = None
+
+from constants import LEADERBOARD_HOST, LEADERBOARD_PORT, SKIN_NAMES
 
 # Constants
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 600
 FPS = 60
-GRAVITY = 0.75
-JUMP_FORCE = -18
-PLAYER_SPEED = 5
+IDLE_FPS = 15
+SIM_HZ = 60
+MAX_STEPS_PER_FRAME = 5
+WARM_BUDGET_MS = 2
+# Per-tick physics, tuned at BASE_TICK_RATE; set_sim_rate rescales it for other step rates
+BASE_TICK_RATE = 60
+BASE_GRAVITY = 0.75
+BASE_JUMP_FORCE = -18
+BASE_PLAYER_SPEED = 5
+BASE_PLATFORM_SPEED_RANGE = (1, 2)
+BASE_CLOUD_SPEED_RANGE = (0.2, 0.5)
+# Trail particles in real time; set_sim_rate turns these into ticks and px per tick
+PARTICLE_LIFE_MS_RANGE = (333, 667)
+PARTICLE_DRIFT_PER_SECOND = 60
+FIRE_RISE_PER_SECOND_RANGE = (30, 90)
+GRAVITY = BASE_GRAVITY
+JUMP_FORCE = BASE_JUMP_FORCE
+PLAYER_SPEED = BASE_PLAYER_SPEED
+PLATFORM_SPEED_RANGE = BASE_PLATFORM_SPEED_RANGE
+CLOUD_SPEED_RANGE = BASE_CLOUD_SPEED_RANGE
 SCROLL_THRESH = 400
 MAX_PLATFORMS = 15
+CHUNK_PLATFORMS = 5
+LOOKAHEAD_CHUNKS = 3
 MIN_PLATFORM_DIST = 100
 MAX_PLATFORM_DIST = 200
 PLATFORM_WIDTH_RANGE = (80, 180)
 PLAYER_WIDTH = 40
 PLAYER_HEIGHT = 60
+CLOUD_COUNT = 12
+CLOUD_MAX_SIZE = 150
+# Sprite sheet written by bake_assets.py; bump ATLAS_VERSION when procedural art changes
+ATLAS_IMAGE = os.path.join("assets", "atlas.png")
+ATLAS_INDEX = os.path.join("assets", "atlas.json")
+ATLAS_VERSION = 2
+CAPTURE_DIR = "captures"
+CAPTURE_SLOTS = 16
 
 # Colors
 SKY_COLOR = (135, 206, 235)
+SKY_GRADIENT_STEPS = (4, 8, 12)
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
@@ -44,19 +87,703 @@ TRAIL_TYPES = {
     "rainbow": {"price": 250, "color": None, "effect": "rainbow"}
 }
 
+# Quality tiers, best first; the governor steps down them when frames run long.
+# trail_interval_ms is time between trail particles (None: no new particles)
+QUALITY_TIERS = (
+    {"name": "high", "trail_interval_ms": 50, "grass": True, "shadows": True, "coin_shine": True, "clouds": True},
+    {"name": "medium", "trail_interval_ms": 100, "grass": False, "shadows": True, "coin_shine": True, "clouds": True},
+    {"name": "low", "trail_interval_ms": 200, "grass": False, "shadows": False, "coin_shine": False, "clouds": True},
+    {"name": "minimal", "trail_interval_ms": None, "grass": False, "shadows": False, "coin_shine": False, "clouds": False},
+)
+FRAME_BUDGET_MS = 1000 / FPS
+
+# Input bits for one simulation tick
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+
+class StartupTimer:
+    """Startup milestones in ms since main.py was imported."""
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}
+    
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = (time.perf_counter() - self.start) * 1000
+        return self.marks[name]
+    
+    def summary(self):
+        return ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.marks.items())
+
+startup = StartupTimer()
+
+def signal_ready():
+    # Tells the web page's loading overlay the game is up; a no-op on desktop
+    try:
+        import js
+        js.window.loadingManager.complete()
+    except:
+        pass
+
 # Initialize pygame
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Don't Look Down")
+screen = None
 clock = pygame.time.Clock()
 
-def create_platform_texture(width, platform_type):
+def init_display(headless=False):
+    global screen
+    if headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Don't Look Down")
+    return screen
+
+def set_sim_rate(hz):
+    global SIM_HZ, GRAVITY, JUMP_FORCE, PLAYER_SPEED, PLATFORM_SPEED_RANGE, CLOUD_SPEED_RANGE
+    global PARTICLE_LIFE_RANGE, PARTICLE_DRIFT, FIRE_RISE_RANGE
+    scale = BASE_TICK_RATE / hz
+    SIM_HZ = hz
+    GRAVITY = BASE_GRAVITY * scale * scale
+    JUMP_FORCE = BASE_JUMP_FORCE * scale
+    PLAYER_SPEED = BASE_PLAYER_SPEED * scale
+    PLATFORM_SPEED_RANGE = tuple(v * scale for v in BASE_PLATFORM_SPEED_RANGE)
+    CLOUD_SPEED_RANGE = tuple(v * scale for v in BASE_CLOUD_SPEED_RANGE)
+    PARTICLE_LIFE_RANGE = tuple(max(1, round(ms * hz / 1000)) for ms in PARTICLE_LIFE_MS_RANGE)
+    PARTICLE_DRIFT = PARTICLE_DRIFT_PER_SECOND / hz
+    FIRE_RISE_RANGE = tuple(v / hz for v in FIRE_RISE_PER_SECOND_RANGE)
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+class FixedStep:
+    """Turns variable frame times into whole fixed-rate sim steps plus a render blend factor."""
+    
+    def __init__(self, hz, max_steps=MAX_STEPS_PER_FRAME):
+        self.step_ms = 1000 / hz
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.alpha = 0.0
+    
+    def advance(self, frame_ms):
+        self.accumulator += frame_ms
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            # Too far behind to catch up; drop the backlog rather than spiral
+            steps = self.max_steps
+            self.accumulator %= self.step_ms
+        else:
+            self.accumulator -= steps * self.step_ms
+        self.alpha = self.accumulator / self.step_ms
+        return steps
+
+set_sim_rate(SIM_HZ)
+
+class FontRegistry:
+    """One SysFont per (name, size, bold); SysFont lookups are slow under pygbag."""
+    
+    def __init__(self):
+        self.fonts = {}
+    
+    def get(self, size, bold=False, name="Arial"):
+        key = (name, size, bold)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(name, size, bold=bold)
+            self.fonts[key] = font
+        return font
+
+class TextCache:
+    """LRU cache of rendered text surfaces, bounded by total pixel bytes."""
+    
+    def __init__(self, fonts, max_bytes=4 * 1024 * 1024):
+        self.fonts = fonts
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()
+    
+    def render(self, text, size, color, bold=False, antialias=True, name="Arial"):
+        key = ((name, size, bold), text, tuple(color), antialias)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            return surf
+        
+        surf = self.fonts.get(size, bold, name).render(text, antialias, color)
+        self.entries[key] = surf
+        self.used_bytes += surf.get_pitch() * surf.get_height()
+        while self.used_bytes > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.used_bytes -= old.get_pitch() * old.get_height()
+        return surf
+    
+    def clear(self):
+        self.entries.clear()
+        self.used_bytes = 0
+
+class TextLabel:
+    """A changing string (score, coins) that is re-rendered only when its text changes."""
+    
+    def __init__(self, size, color, bold=False, name="Arial"):
+        self.size = size
+        self.color = color
+        self.bold = bold
+        self.name = name
+        self.text = None
+        self.surface = None
+    
+    def render(self, text):
+        if text != self.text:
+            self.surface = fonts.get(self.size, self.bold, self.name).render(text, True, self.color)
+            self.text = text
+        return self.surface
+
+fonts = FontRegistry()
+text_cache = TextCache(fonts)
+
+class FrameProfiler:
+    """Per-frame phase timings with rolling percentiles, an overlay and Chrome trace export.
+    
+    Phases are timed by wrapping Game methods on the instance while the
+    profiler is on, so a disabled profiler costs nothing.
+    """
+    PHASES = (
+        "handle_events", "update",
+        "update_clouds", "update_player", "update_platforms", "generate_platforms", "update_camera", "update_coins",
+        "draw", "draw_background", "draw_clouds", "draw_platforms", "draw_coins", "draw_player", "draw_hud",
+        "draw_menu", "draw_shop", "draw_game_over",
+    )
+    TOP_LEVEL = ("handle_events", "update", "draw", "capture", "flip")
+    HISTORY = 300
+    MAX_EVENTS = 200000
+    OVERLAY_MS = 250
+    
+    def __init__(self, history=HISTORY, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.game = None
+        self.originals = {}
+        self.current = {}
+        self.frames = deque(maxlen=history)
+        self.events = deque(maxlen=max_events)
+        # Milliseconds per phase since creation, unlike frames which only keeps the recent ones
+        self.totals = {}
+        self.origin = time.perf_counter()
+        self.frame_start = None
+        self.labels = []
+        self.lines = []
+        self.panel = None
+        self.next_overlay = 0
+    
+    def toggle(self, game):
+        if self.enabled:
+            self.detach()
+        else:
+            self.attach(game)
+    
+    def attach(self, game):
+        self.game = game
+        for name in self.PHASES:
+            self.originals[name] = game.__dict__.get(name)
+            setattr(game, name, self.wrap(name, getattr(game, name)))
+        self.enabled = True
+        self.frame_start = time.perf_counter()
+    
+    def detach(self):
+        for name, original in self.originals.items():
+            if original is None:
+                delattr(self.game, name)
+            else:
+                setattr(self.game, name, original)
+        self.originals.clear()
+        self.current.clear()
+        self.enabled = False
+    
+    def wrap(self, name, method):
+        current = self.current
+        events = self.events
+        perf_counter = time.perf_counter
+        
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                end = perf_counter()
+                current[name] = current.get(name, 0.0) + (end - start) * 1000
+                events.append((name, start, end))
+        return timed
+    
+    def run(self, name, func, *args):
+        return self.wrap(name, func)(*args)
+    
+    def end_frame(self):
+        now = time.perf_counter()
+        self.current["frame"] = (now - self.frame_start) * 1000
+        self.current["work"] = sum(self.current.get(name, 0.0) for name in self.TOP_LEVEL)
+        self.frames.append(dict(self.current))
+        for name, ms in self.current.items():
+            self.totals[name] = self.totals.get(name, 0.0) + ms
+        self.current.clear()
+        self.events.append(("frame", self.frame_start, now))
+        self.frame_start = now
+    
+    def percentiles(self, name, qs=(50, 95, 99)):
+        if not self.frames:
+            return [0.0] * len(qs)
+        # Linear between the closest ranks, as numpy.percentile does by default
+        values = sorted(frame.get(name, 0.0) for frame in self.frames)
+        result = []
+        for q in qs:
+            pos = (len(values) - 1) * q / 100
+            i = int(pos)
+            upper = values[min(i + 1, len(values) - 1)]
+            result.append(values[i] + (upper - values[i]) * (pos - i))
+        return result
+    
+    def summary(self):
+        names = [name for name in self.PHASES + ("capture", "flip") if any(name in frame for frame in self.frames)]
+        return {name: self.percentiles(name) for name in ("frame", "work") + tuple(names)}
+    
+    def export_trace(self, path="frame_trace.json"):
+        events = [
+            {"name": name, "cat": "frame", "ph": "X", "pid": 0, "tid": 0,
+             "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6}
+            for name, start, end in self.events
+        ]
+        try:
+            with open(path, "w") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            print(f"Wrote {len(events)} trace events to {path}")
+            return path
+        except OSError as e:
+            print(f"Error writing trace: {e}")
+            return None
+    
+    def draw_overlay(self, surface):
+        now = pygame.time.get_ticks()
+        if now >= self.next_overlay:
+            self.next_overlay = now + self.OVERLAY_MS
+            self.lines = [("ms", "p50", "p95", "p99")]
+            for name, values in self.summary().items():
+                self.lines.append((name,) + tuple(f"{v:.2f}" for v in values))
+            self.lines.append(("quality", "", "", quality.settings["name"]))
+            while len(self.labels) < len(self.lines):
+                self.labels.append([TextLabel(14, WHITE) for _ in range(4)])
+        
+        height = 8 + 16 * len(self.lines)
+        if self.panel is None or self.panel.get_height() != height:
+            self.panel = pygame.Surface((300, height), pygame.SRCALPHA)
+            self.panel.fill((0, 0, 0, 170))
+        x = surface.get_width() - self.panel.get_width() - 10
+        surface.blit(self.panel, (x, 10))
+        for row, (line, labels) in enumerate(zip(self.lines, self.labels)):
+            y = 14 + 16 * row
+            surface.blit(labels[0].render(line[0]), (x + 8, y))
+            # Numbers are right-aligned in fixed columns
+            for right, text, label in zip((200, 245, 290), line[1:], labels[1:]):
+                rendered = label.render(text)
+                surface.blit(rendered, (x + right - rendered.get_width(), y))
+
+profiler = FrameProfiler()
+
+class FrameRecorder:
+    """Records drawn frames as numbered PNGs, encoded and written on a worker thread.
+    
+    capture() copies the screen's pixels into a free slot of a fixed ring and
+    returns; if the encoder has fallen behind and no slot is free, the frame
+    is dropped rather than waiting. Gaps in the frame numbers are the drops.
+    """
+    
+    def __init__(self, slots=CAPTURE_SLOTS, directory=CAPTURE_DIR):
+        self.slots = slots
+        self.directory = directory
+        self.enabled = False
+        self.ring = None
+        self.worker = None
+        self.path = None
+        self.frame = self.captured = self.dropped = self.written = 0
+    
+    def toggle(self, surface):
+        if self.enabled:
+            self.stop()
+        else:
+            self.start(surface)
+    
+    def start(self, surface):
+        if np is None:
+            print("Capture needs numpy")
+            return False
+        if surface.get_bytesize() != 4:
+            print("Capture needs a 32-bit display surface")
+            return False
+        width, height = surface.get_size()
+        # Slots are laid out like the surface's rows, so a capture is one straight copy
+        if self.ring is None or self.ring.shape[1:] != (height, width):
+            self.ring = np.empty((self.slots, height, width), dtype=np.uint32)
+        self.shifts = surface.get_shifts()[:3]
+        self.free = queue.SimpleQueue()
+        for slot in range(self.slots):
+            self.free.put(slot)
+        self.filled = queue.SimpleQueue()
+        self.frame = self.captured = self.dropped = self.written = 0
+        
+        try:
+            self.path = os.path.join(self.directory, time.strftime("%Y%m%d-%H%M%S"))
+            os.makedirs(self.path, exist_ok=True)
+            self.worker = threading.Thread(target=self.encode_frames, name="capture", daemon=True)
+            self.worker.start()
+        except (OSError, RuntimeError) as e:
+            print(f"Error starting capture: {e}")
+            return False
+        self.enabled = True
+        print(f"Capture: recording to {self.path}")
+        return True
+    
+    def capture(self, surface):
+        self.frame += 1
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        pixels = pygame.surfarray.pixels2d(surface)
+        np.copyto(self.ring[slot], pixels.T)
+        # The view locks the surface; let go before the flip
+        del pixels
+        self.filled.put((slot, self.frame))
+        self.captured += 1
+        return True
+    
+    def encode_frames(self):
+        while True:
+            item = self.filled.get()
+            if item is None:
+                return
+            slot, frame = item
+            try:
+                self.write_png(os.path.join(self.path, f"frame_{frame:06d}.png"), self.ring[slot])
+                self.written += 1
+            except OSError as e:
+                print(f"Error writing frame {frame}: {e}")
+            finally:
+                self.free.put(slot)
+    
+    def write_png(self, path, pixels):
+        height, width = pixels.shape
+        # Each PNG row starts with a filter byte (0: none), then RGB triples
+        rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+        for channel, shift in enumerate(self.shifts):
+            rows[:, 1 + channel::3] = pixels >> shift
+        
+        def chunk(tag, data):
+            return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+        
+        with open(path, 'wb') as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+            f.write(chunk(b"IDAT", zlib.compress(rows, 1)))
+            f.write(chunk(b"IEND", b""))
+    
+    def stop(self):
+        # Waits for the frames already in the ring to be written
+        self.enabled = False
+        self.filled.put(None)
+        self.worker.join()
+        self.worker = None
+        print(f"Capture: {self.summary()}")
+    
+    def summary(self):
+        return (f"{self.captured} frames captured, {self.dropped} dropped, "
+                f"{self.written} written to {self.path}")
+
+recorder = FrameRecorder()
+
+class QualityGovernor:
+    """Steps QUALITY_TIERS down while frames run over budget and back up when there's headroom.
+    
+    Decisions use the median of the last WINDOW frames, have to hold for a
+    while before the tier changes, and going back up needs much more
+    headroom (and longer, after each step down) than stepping down does, so
+    the tier doesn't flicker.
+    """
+    WINDOW = 30
+    SLOW = 1.15
+    HEADROOM = 0.5
+    DOWN_AFTER_MS = 500
+    UP_AFTER_MS = 3000
+    MAX_UP_AFTER_MS = 60000
+    
+    def __init__(self, tiers=QUALITY_TIERS, budget_ms=FRAME_BUDGET_MS):
+        self.tiers = tiers
+        self.budget_ms = budget_ms
+        self.frames = deque(maxlen=self.WINDOW)
+        self.work = deque(maxlen=self.WINDOW)
+        self.up_after_ms = self.UP_AFTER_MS
+        self.set_tier(0)
+    
+    def set_tier(self, tier):
+        self.tier = tier
+        self.settings = self.tiers[tier]
+        # Judge the new tier on its own frames
+        self.frames.clear()
+        self.work.clear()
+        self.over_ms = self.under_ms = 0
+    
+    def observe(self, frame_ms, work_ms):
+        # frame_ms is the time between frames as the player sees it; work_ms
+        # is the part spent updating and drawing, which shows the headroom
+        self.frames.append(frame_ms)
+        self.work.append(work_ms)
+        if len(self.frames) < self.WINDOW:
+            return
+        frame = sorted(self.frames)[self.WINDOW // 2]
+        work = sorted(self.work)[self.WINDOW // 2]
+        
+        if frame > self.budget_ms * self.SLOW or work > self.budget_ms:
+            self.over_ms += frame_ms
+            self.under_ms = 0
+        elif work < self.budget_ms * self.HEADROOM:
+            self.under_ms += frame_ms
+            self.over_ms = 0
+        else:
+            self.over_ms = self.under_ms = 0
+        
+        if self.over_ms >= self.DOWN_AFTER_MS and self.tier < len(self.tiers) - 1:
+            # Each step down makes the next try at a better tier wait longer
+            self.up_after_ms = min(self.up_after_ms * 2, self.MAX_UP_AFTER_MS)
+            self.change(self.tier + 1, frame, work)
+        elif self.under_ms >= self.up_after_ms and self.tier > 0:
+            self.change(self.tier - 1, frame, work)
+    
+    def change(self, tier, frame, work):
+        print(f"Quality: {self.settings['name']} -> {self.tiers[tier]['name']} "
+              f"(frame {frame:.1f} ms, work {work:.1f} ms, budget {self.budget_ms:.1f} ms)")
+        self.set_tier(tier)
+
+quality = QualityGovernor()
+
+class JumpEnvelope:
+    """Jump timings for every rise the generator can roll, tabulated once.
+    
+    Rebuilt only when the physics constants change (e.g. after set_sim_rate).
+    """
+    
+    def __init__(self):
+        self.key = None
+    
+    def get(self):
+        key = (GRAVITY, JUMP_FORCE, PLAYER_SPEED, PLAYER_HEIGHT, MIN_PLATFORM_DIST, MAX_PLATFORM_DIST)
+        if key != self.key:
+            self.build()
+            self.key = key
+        return self
+    
+    def build(self):
+        vel = [JUMP_FORCE + GRAVITY * tick for tick in range(1, int(2 * -JUMP_FORCE / GRAVITY) + 3)]
+        offset = list(itertools.accumulate(vel))
+        # The rect rounds the float position half away from zero, so at y >= 0
+        # ties drop the player a pixel (low) and at y < 0 they lift it (high).
+        # A jump that crosses y = 0 mixes the two and stays between them, so it
+        # is checked against both bounds.
+        low = [-math.floor(v + 0.5) for v in offset]
+        high = [-math.ceil(v - 0.5) for v in offset]
+        self.apex = max(high)
+        rises = range(MIN_PLATFORM_DIST, MAX_PLATFORM_DIST + 1)
+        rising = [t for t, v in enumerate(vel) if v < 0]
+        falling = [t for t, v in enumerate(vel) if v >= 0]
+        
+        self.valid_rises = []
+        self.setup_reach = []
+        for lo, hi in ((low, low), (high, high), (low, high)):
+            # Heights are feet above the takeoff platform; the target spans (rise - 20, rise].
+            # Landing needs the feet over the top while rising, then the first
+            # tick back below it within the top half of the platform.
+            peak = max(lo[t] for t in rising)
+            valid = []
+            for rise in rises:
+                below = next((t for t in falling if hi[t] < rise), None)
+                too_deep = next((t for t in falling if lo[t] < rise - 10), None)
+                if peak >= rise and below is not None and too_deep is not None and too_deep > below:
+                    valid.append(rise)
+            self.valid_rises.append(valid)
+            # Ticks available to line up beside the target before the body reaches it;
+            # the rect can round either way, so count only whole pixels of travel
+            reach = []
+            for rise in rises:
+                enter = next((t + 1 for t in rising if hi[t] + PLAYER_HEIGHT > rise - 20), 0)
+                reach.append(math.floor(enter * PLAYER_SPEED))
+            self.setup_reach.append(reach)
+    
+    def rule(self, takeoff_y):
+        # Index into the tables for a jump starting from a platform top at takeoff_y
+        if takeoff_y - PLAYER_HEIGHT - self.apex - 1 >= 0:
+            return 0
+        if takeoff_y - PLAYER_HEIGHT < 0:
+            return 1
+        return 2
+    
+    def placements(self, rule, prev, rise, width, motion, lo, hi):
+        """Sorted, disjoint [start, stop) runs of x in [lo, hi] reachable from the prev (x, width, motion)."""
+        reach = self.setup_reach[rule][rise - MIN_PLATFORM_DIST]
+        a_lo, a_hi = standing_range(*prev)
+        extent = motion_extent(motion)
+        # The player has to rise past the target's side, then drift over it.
+        # Where it clears must be somewhere the player can reach and stand:
+        clear_lo = max(0, a_lo - reach)
+        clear_hi = min(SCREEN_WIDTH - PLAYER_WIDTH, a_hi + reach)
+        # just left of the target (x - PLAYER_WIDTH - extent), or just right
+        # of it (x + width + extent); each is one run of x
+        runs = []
+        for shift in (PLAYER_WIDTH + extent, -width - extent):
+            start, stop = max(lo, clear_lo + shift), min(hi, clear_hi + shift) + 1
+            if start < stop:
+                runs.append([start, stop])
+        runs.sort()
+        if len(runs) == 2 and runs[1][0] <= runs[0][1]:
+            runs = [[runs[0][0], max(runs[0][1], runs[1][1])]]
+        return runs
+
+def pick_run(rng, runs):
+    # Uniform over the x positions in the runs, drawn like an index into all of them
+    k = rng.randrange(sum(stop - start for start, stop in runs))
+    for start, stop in runs:
+        if k < stop - start:
+            return start + k
+        k -= stop - start
+
+jump_envelope = JumpEnvelope()
+
+ROLL_ATTEMPTS = 8
+# Times roll_platform had to draw again or clamp x; analyze_levels.py reports these
+roll_fallbacks = {"rerolls": 0, "clamps": 0}
+
+def motion_extent(motion):
+    return 0 if motion is None else motion[2] + math.ceil(motion[1])
+
+def standing_range(x, width, motion=None):
+    # Left-edge positions where the player still overlaps the platform,
+    # widened by a moving platform's travel
+    extent = motion_extent(motion)
+    lo, hi = x - PLAYER_WIDTH + 1 - extent, x + width - 1 + extent
+    return max(0, lo), min(SCREEN_WIDTH - PLAYER_WIDTH, hi)
+
+def roll_platform(rng, prev_x, prev_y, prev_width, prev_motion=None):
+    # Pure level data (no surfaces), shared by Game and the offline level tools.
+    # Returns (x, y, width, motion, coin_x); motion is (move_dir, speed, move_dist) or None.
+    # Rises and x positions are drawn only from what the jump envelope can reach.
+    envelope = jump_envelope.get()
+    rule = envelope.rule(prev_y)
+    rises = envelope.valid_rises[rule]
+    prev = (prev_x, prev_width, prev_motion)
+    min_x = int(max(0, prev_x - 200))
+    max_x = int(min(SCREEN_WIDTH - 100, prev_x + 200))
+    
+    for attempt in range(ROLL_ATTEMPTS):
+        if attempt:
+            roll_fallbacks["rerolls"] += 1
+        rise = rises[rng.randrange(len(rises))]
+        y = prev_y - rise
+        width = rng.randint(*PLATFORM_WIDTH_RANGE)
+        
+        motion = None
+        if rng.random() < 0.2:
+            motion = (rng.choice([-1, 1]), rng.uniform(*PLATFORM_SPEED_RANGE), rng.randint(50, 150))
+        
+        runs = envelope.placements(rule, prev, rise, width, motion, min_x, max_x)
+        if not runs and motion is not None:
+            # A moving platform's sweep can block every takeoff spot (e.g. against
+            # the screen edge); keep it still rather than place it out of reach
+            motion = None
+            runs = envelope.placements(rule, prev, rise, width, motion, min_x, max_x)
+        if runs:
+            x = pick_run(rng, runs)
+            break
+    else:
+        # Nothing reachable within 200px of prev_x: use the reachable x closest
+        # to it anywhere on screen, never a random spot that may be out of reach
+        motion = None
+        runs = envelope.placements(rule, prev, rise, width, motion, 0, SCREEN_WIDTH - 100)
+        if not runs:
+            raise RuntimeError(f"No reachable platform position from ({prev_x}, {prev_y})")
+        roll_fallbacks["clamps"] += 1
+        target = int(prev_x)
+        x = min((min(max(target, start), stop - 1) for start, stop in runs), key=lambda x: abs(x - target))
+    
+    coin_x = None
+    if rng.random() < 0.3:
+        coin_x = x + rng.randint(20, width - 20)
+    
+    return x, y, width, motion, coin_x
+
+class BakedAtlas:
+    """Sprites pre-rendered by bake_assets.py into one sheet, sliced out as sub-surfaces."""
+    
+    def __init__(self, image_path=ATLAS_IMAGE, index_path=ATLAS_INDEX):
+        self.image_path = image_path
+        self.index_path = index_path
+        self.sheet = None
+        self.rects = None
+    
+    @staticmethod
+    def fingerprint():
+        # Everything that decides which sprites exist and their sizes; an atlas
+        # baked with different values is ignored rather than sliced wrongly
+        return json.loads(json.dumps({
+            "version": ATLAS_VERSION,
+            "platform_types": PlatformTextureAtlas.TYPES,
+            "platform_widths": PLATFORM_WIDTH_RANGE,
+            "width_step": PlatformTextureAtlas.WIDTH_STEP,
+            "variants": PlatformTextureAtlas.VARIANTS,
+            "grass_frames": PlatformTextureAtlas.GRASS_FRAMES,
+            "skins": sorted(SkinRegistry.SKINS),
+            "player": (PLAYER_WIDTH, PLAYER_HEIGHT),
+            "preview": SkinRegistry.PREVIEW_SIZE,
+            "coin_frames": CoinStore.SPIN_FRAMES,
+        }))
+    
+    def load(self):
+        if self.rects is not None:
+            return
+        self.rects = {}
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            if index.get("fingerprint") != self.fingerprint():
+                print("Baked atlas is out of date, generating sprites instead")
+                return
+            sheet = pygame.image.load(self.image_path)
+            if pygame.display.get_surface() is not None:
+                sheet = sheet.convert_alpha()
+            self.sheet = sheet
+            self.rects = {name: pygame.Rect(rect) for name, rect in index["sprites"].items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, pygame.error) as e:
+            print(f"Error loading baked atlas: {e}")
+    
+    def clear(self):
+        # Forget the sheet; every lookup falls back to procedural generation
+        self.sheet = None
+        self.rects = {}
+    
+    def get(self, name):
+        self.load()
+        rect = self.rects.get(name)
+        if rect is None:
+            return None
+        return self.sheet.subsurface(rect)
+
+baked_atlas = BakedAtlas()
+
+def create_platform_texture(width, platform_type, rng=random):
     texture = pygame.Surface((width, 20), pygame.SRCALPHA)
     
     if platform_type == "wood":
         plank_width = 20
         for i in range(0, width, plank_width):
-            shade = random.randint(150, 200)
+            shade = rng.randint(150, 200)
             pygame.draw.rect(texture, (139, 69, 19), (i, 0, plank_width, 20))
             pygame.draw.rect(texture, (shade, shade//2, shade//4), (i, 0, plank_width, 2))
             pygame.draw.line(texture, (100, 50, 0), (i, 0), (i, 20), 1)
@@ -65,19 +792,106 @@ def create_platform_texture(width, platform_type):
         pygame.draw.rect(texture, (101, 67, 33), (0, 5, width, 15))
         pygame.draw.rect(texture, (34, 139, 34), (0, 0, width, 5))
         for i in range(0, width, 5):
-            height = random.randint(1, 3)
-            pygame.draw.rect(texture, (random.randint(50, 150), random.randint(150, 200), random.randint(50, 100)), 
+            height = rng.randint(1, 3)
+            pygame.draw.rect(texture, (rng.randint(50, 150), rng.randint(150, 200), rng.randint(50, 100)), 
                            (i, 0, 2, height))
     
     elif platform_type == "stone":
         pygame.draw.rect(texture, (150, 150, 150), (0, 0, width, 20))
         for _ in range(width//5):
-            x, y = random.randint(0, width-5), random.randint(0, 15)
-            shade = random.randint(100, 200)
+            x, y = rng.randint(0, width-5), rng.randint(0, 15)
+            shade = rng.randint(100, 200)
             pygame.draw.rect(texture, (shade, shade, shade), (x, y, 5, 5))
     
     return texture
 
+def create_grass_frame(width, rng=random):
+    frame = pygame.Surface((width + 2, 8), pygame.SRCALPHA)
+    for i in range(0, width, 5):
+        if rng.random() < 0.3:
+            grass_height = rng.randint(3, 7)
+            pygame.draw.line(frame, (rng.randint(50, 150), rng.randint(150, 200), 50),
+                           (i, 7 - grass_height), (i, 7), 2)
+    return frame
+
+class PlatformTextureAtlas:
+    """Shared platform sprites per (type, width bucket, variant) with the drop shadow baked in."""
+    
+    TYPES = ("wood", "grass", "stone")
+    WIDTH_STEP = 20
+    VARIANTS = 4
+    GRASS_FRAMES = 4
+    GRASS_FRAME_MS = 120
+    SHADOW_OFFSET = 3
+    CAP_WIDTH = 10
+    
+    def __init__(self):
+        self.sprites = {}
+        self.grass_frames = {}
+    
+    def bucket(self, width):
+        return max(PLATFORM_WIDTH_RANGE[0], -(-width // self.WIDTH_STEP) * self.WIDTH_STEP)
+    
+    def sprite(self, platform_type, width, variant=0):
+        key = (platform_type, self.bucket(width), variant % self.VARIANTS)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.build_sprite(*key)
+            self.sprites[key] = sprite
+        return sprite
+    
+    def build_sprite(self, platform_type, bucket, variant):
+        baked = baked_atlas.get(f"platform:{platform_type}:{bucket}:{variant}")
+        if baked is not None:
+            return baked
+        rng = random.Random(f"{platform_type}:{bucket}:{variant}")
+        offset = self.SHADOW_OFFSET
+        sprite = pygame.Surface((bucket + offset, 20 + offset), pygame.SRCALPHA)
+        pygame.draw.rect(sprite, (0, 0, 0, 100), (offset, offset, bucket, 20), border_radius=5)
+        sprite.blit(create_platform_texture(bucket, platform_type, rng), (0, 0))
+        return sprite
+    
+    def grass_frame(self, width, frame):
+        key = (self.bucket(width), frame % self.GRASS_FRAMES)
+        surf = self.grass_frames.get(key)
+        if surf is None:
+            surf = baked_atlas.get(f"grass:{key[0]}:{key[1]}")
+            if surf is None:
+                surf = create_grass_frame(key[0], random.Random(f"grass:{key[0]}:{key[1]}"))
+            self.grass_frames[key] = surf
+        return surf
+    
+    def warm_steps(self):
+        # One sprite per step, so warming can be spread over frames
+        for width in range(PLATFORM_WIDTH_RANGE[0], PLATFORM_WIDTH_RANGE[1] + 1, self.WIDTH_STEP):
+            for platform_type in self.TYPES:
+                for variant in range(self.VARIANTS):
+                    self.sprite(platform_type, width, variant)
+                    yield
+            for frame in range(self.GRASS_FRAMES):
+                self.grass_frame(width, frame)
+                yield
+    
+    def warm(self):
+        for _ in self.warm_steps():
+            pass
+    
+    def blit(self, surface, sprite, pos, width, shadow=True):
+        # Sprites are built at the bucket width; crop the body to the platform's
+        # width and re-attach the rounded right end (and its shadow) from the sprite
+        bucket_width = sprite.get_width() - self.SHADOW_OFFSET
+        if width == bucket_width and shadow:
+            surface.blit(sprite, pos)
+            return
+        cap = min(self.CAP_WIDTH, width)
+        overhang = self.SHADOW_OFFSET if shadow else 0
+        height = sprite.get_height() - self.SHADOW_OFFSET + overhang
+        surface.blit(sprite, pos, (0, 0, width - cap, height))
+        surface.blit(sprite, (pos[0] + width - cap, pos[1]),
+                     (bucket_width - cap, 0, cap + overhang, height))
+
+platform_atlas = PlatformTextureAtlas()
+
 def create_player_skin(color, style="default"):
     surf = pygame.Surface((PLAYER_WIDTH, PLAYER_HEIGHT), pygame.SRCALPHA)
     
@@ -158,87 +972,453 @@ def create_player_skin(color, style="default"):
     
     return surf
 
-class TrailParticle:
-    def __init__(self, x, y, trail_type):
-        self.x = x
-        self.y = y
-        self.size = random.randint(2, 5)
-        self.life = random.randint(20, 40)
-        self.max_life = self.life
-        self.trail_type = trail_type
+class SkinRegistry:
+    """Player skins built on first use and kept as normal, flipped and shop preview surfaces."""
+    
+    SKINS = {
+        "bach": ((50, 50, 150), "bach"),
+        "default": ((200, 100, 50), "default"),
+        "classic": ((200, 100, 50), "classic"),
+        "ninja": (BLACK, "ninja"),
+        "robot": ((150, 150, 150), "robot"),
+        "wizard": ((100, 50, 150), "wizard"),
+    }
+    # The leaderboard validates skins against SKIN_NAMES without importing this module
+    assert SKINS.keys() == set(SKIN_NAMES)
+    PREVIEW_SIZE = (60, 90)
+    VIEWS = ("normal", "flipped", "preview")
+    
+    def __init__(self):
+        self.variants = {}
+    
+    def __contains__(self, name):
+        return name in self.SKINS
+    
+    def get(self, name):
+        # (normal, flipped, preview)
+        variants = self.variants.get(name)
+        if variants is None:
+            variants = tuple(baked_atlas.get(f"skin:{name}:{view}") for view in self.VIEWS)
+            if None not in variants:
+                self.variants[name] = variants
+                return variants
+            image = create_player_skin(*self.SKINS[name])
+            variants = (
+                image,
+                pygame.transform.flip(image, True, False),
+                pygame.transform.scale(image, self.PREVIEW_SIZE),
+            )
+            if pygame.display.get_surface() is not None:
+                variants = tuple(surface.convert_alpha() for surface in variants)
+            self.variants[name] = variants
+        return variants
+    
+    def image(self, name, flipped=False):
+        return self.get(name)[1 if flipped else 0]
+    
+    def preview(self, name):
+        return self.get(name)[2]
+
+skin_registry = SkinRegistry()
+
+def create_sky_gradient(size, base_color, steps):
+    width, height = size
+    surf = pygame.Surface(size)
+    for y in range(height):
+        color = tuple(min(255, c + y // step) for c, step in zip(base_color, steps))
+        pygame.draw.line(surf, color, (0, y), (width, y))
+    return surf
+
+def create_overlay_background(sky, fill):
+    surf = sky.copy()
+    overlay = pygame.Surface(sky.get_size(), pygame.SRCALPHA)
+    overlay.fill(fill)
+    surf.blit(overlay, (0, 0))
+    return surf
+
+def create_menu_layer(size):
+    width, height = size
+    surf = pygame.Surface(size, pygame.SRCALPHA)
+    
+    title_font = fonts.get(60, bold=True)
+    title_text = title_font.render("DON'T LOOK DOWN", True, BLACK)
+    shadow_text = title_font.render("DON'T LOOK DOWN", True, (100, 100, 100, 150))
+    surf.blit(shadow_text, (width // 2 - title_text.get_width() // 2 + 3, 103))
+    surf.blit(title_text, (width // 2 - title_text.get_width() // 2, 100))
+    
+    instr_font = fonts.get(24)
+    instructions = [
+        "Climb as high as you can!",
+        "Use LEFT/RIGHT or A/D to move",
+        "Press SPACE to jump",
+        "Collect coins to buy skins & trails",
+        "Don't fall off the screen!"
+    ]
+    
+    # The screen has no alpha channel, so this panel has always been drawn opaque
+    pygame.draw.rect(surf, WHITE, 
+                   (width // 2 - 200, 520, 400, len(instructions) * 30 + 10), 
+                   border_radius=10)
+    
+    for i, line in enumerate(instructions):
+        text = instr_font.render(line, True, BLACK)
+        surf.blit(text, (width // 2 - text.get_width() // 2, 530 + i * 30))
+    
+    return surf
+
+def create_shop_layer(sky):
+    width, height = sky.get_size()
+    surf = create_overlay_background(sky, (200, 220, 255, 200))
+    
+    title_font = fonts.get(60, bold=True)
+    title_text = title_font.render("SKIN SHOP", True, (50, 50, 150))
+    surf.blit(title_text, (width // 2 - title_text.get_width() // 2, 50))
+    
+    font = fonts.get(30, bold=True)
+    skins_label = font.render("SKINS", True, (50, 50, 150))
+    surf.blit(skins_label, (150, 120))
+    
+    trails_label = font.render("TRAILS", True, (50, 50, 150))
+    surf.blit(trails_label, (150, 320))
+    
+    pygame.draw.rect(surf, WHITE, (100, 150, 800, 150), border_radius=15)
+    pygame.draw.rect(surf, WHITE, (100, 350, 800, 150), border_radius=15)
+    
+    return surf
+
+def create_game_over_layer(sky):
+    width, height = sky.get_size()
+    surf = create_overlay_background(sky, (0, 0, 0, 200))
+    
+    game_over_font = fonts.get(80, bold=True)
+    game_over_text = game_over_font.render("GAME OVER", True, (255, 100, 100))
+    surf.blit(game_over_text, (width // 2 - game_over_text.get_width() // 2, height // 2 - 150))
+    
+    restart_font = fonts.get(30)
+    restart_text = restart_font.render("Click or press ENTER to restart", True, WHITE)
+    surf.blit(restart_text, (width // 2 - restart_text.get_width() // 2, height // 2 + 120))
+    
+    return surf
+
+class LayerCache:
+    """Static screen layers baked once and rebuilt only when their inputs change."""
+    
+    def __init__(self):
+        self.layers = {}
+    
+    def get(self, name, builder, *inputs):
+        cached = self.layers.get(name)
+        if cached is None or cached[0] != inputs:
+            cached = (inputs, builder(*inputs))
+            self.layers[name] = cached
+        return cached[1]
+    
+    def invalidate(self, name=None):
+        if name is None:
+            self.layers.clear()
+        else:
+            self.layers.pop(name, None)
+
+class BackgroundRenderer:
+    def __init__(self):
+        self.cache = LayerCache()
+    
+    def sky(self, size):
+        return self.cache.get("sky", create_sky_gradient, size, SKY_COLOR, SKY_GRADIENT_STEPS)
+    
+    def background(self, state, size):
+        sky = self.sky(size)
+        if state == "menu":
+            return self.cache.get("menu_bg", create_overlay_background, sky, (255, 255, 255, 150))
+        if state == "shop":
+            return self.cache.get("shop_bg", create_shop_layer, sky)
+        if state == "game_over":
+            return self.cache.get("game_over_bg", create_game_over_layer, sky)
+        return sky
+    
+    def menu_foreground(self, size):
+        return self.cache.get("menu_fg", create_menu_layer, size)
+
+class ParticleStore:
+    """Struct-of-arrays trail particles with preallocated capacity and swap-remove compaction."""
+    
+    KINDS = {"sparkle": 0, "fire": 1, "shadow": 2, "rainbow": 3}
+    shadow_sprites = {}
+    
+    def __init__(self, capacity=4096, rng=random):
+        self.capacity = capacity
+        # A generator of its own, seeded once from the caller's, so the
+        # per-particle draws are plain bound-method calls on a local Random
+        self.rng = random.Random(rng.getrandbits(64))
+        self.count = 0
+        self.x = array("f", bytes(4 * capacity))
+        self.y = array("f", bytes(4 * capacity))
+        self.vx = array("f", bytes(4 * capacity))
+        self.vy = array("f", bytes(4 * capacity))
+        self.life = array("h", bytes(2 * capacity))
+        self.max_life = array("h", [1]) * capacity
+        self.size = array("h", bytes(2 * capacity))
+        self.red = array("B", bytes(capacity))
+        self.green = array("B", bytes(capacity))
+        self.blue = array("B", bytes(capacity))
+        self.kind = array("b", bytes(capacity))
+    
+    def __len__(self):
+        return self.count
+    
+    def clear(self):
+        self.count = 0
+    
+    def emit(self, x, y, trail_type):
+        if self.count >= self.capacity or trail_type not in self.KINDS:
+            return False
+        i = self.count
+        rng = self.rng
+        self.x[i] = x
+        self.y[i] = y
+        self.size[i] = rng.randint(2, 5)
+        self.life[i] = self.max_life[i] = rng.randint(*PARTICLE_LIFE_RANGE)
+        self.kind[i] = self.KINDS[trail_type]
         
         if trail_type == "sparkle":
-            self.color = (random.randint(200, 255), random.randint(200, 255), random.randint(100, 200)
+            color = (rng.randint(200, 255), rng.randint(200, 255), rng.randint(100, 200))
         elif trail_type == "fire":
-            self.color = (255, random.randint(50, 150), 0)
+            color = (255, rng.randint(50, 150), 0)
         elif trail_type == "shadow":
-            self.color = (50, 50, 50, random.randint(100, 200))
+            color = (50, 50, 50)
         elif trail_type == "rainbow":
-            self.color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+            color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        self.red[i], self.green[i], self.blue[i] = color
         
         if trail_type in ["sparkle", "rainbow"]:
-            self.vx = random.uniform(-1, 1)
-            self.vy = random.uniform(-1, 1)
+            self.vx[i] = rng.uniform(-PARTICLE_DRIFT, PARTICLE_DRIFT)
+            self.vy[i] = rng.uniform(-PARTICLE_DRIFT, PARTICLE_DRIFT)
         else:
-            self.vx = 0
-            self.vy = 0
+            self.vx[i] = 0
+            self.vy[i] = 0
+        
+        self.count += 1
+        return True
     
     def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self.life -= 1
-        if self.trail_type == "fire":
-            self.y -= random.uniform(0.5, 1.5)
-        return self.life > 0
+        n = self.count
+        if n == 0:
+            return
+        
+        x, y, vx, vy, life, kind = self.x, self.y, self.vx, self.vy, self.life, self.kind
+        fire = self.KINDS["fire"]
+        uniform = self.rng.uniform
+        rise_lo, rise_hi = FIRE_RISE_RANGE
+        dead = []
+        for i in range(n):
+            x[i] += vx[i]
+            y[i] += vy[i]
+            if kind[i] == fire:
+                y[i] -= uniform(rise_lo, rise_hi)
+            life[i] -= 1
+            if life[i] <= 0:
+                dead.append(i)
+        if dead:
+            self.compact(dead)
+    
+    def compact(self, dead):
+        # Fill holes below the new count with survivors from above it, so only
+        # len(dead) slots move instead of shifting the whole array
+        n = self.count
+        new_count = n - len(dead)
+        holes = [i for i in dead if i < new_count]
+        if holes:
+            movers = [i for i in range(new_count, n) if self.life[i] > 0]
+            for arr in (self.x, self.y, self.vx, self.vy, self.life, self.max_life,
+                        self.size, self.red, self.green, self.blue, self.kind):
+                for hole, mover in zip(holes, movers):
+                    arr[hole] = arr[mover]
+        self.count = new_count
+    
+    @classmethod
+    def shadow_sprite(cls, size, alpha):
+        key = (size, alpha)
+        sprite = cls.shadow_sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((size*2, size*2), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, (50, 50, 50, alpha), (size, size), size)
+            cls.shadow_sprites[key] = sprite
+        return sprite
     
     def draw(self, surface, scroll):
-        alpha = min(255, int(255 * (self.life / self.max_life)))
-        
-        if self.trail_type == "shadow":
-            s = pygame.Surface((self.size*2, self.size*2), pygame.SRCALPHA)
-            pygame.draw.circle(s, (*self.color[:3], alpha), (self.size, self.size), self.size)
-            surface.blit(s, (self.x - scroll[0] - self.size, self.y - scroll[1] - self.size))
-        else:
-            color = self.color
-            if self.trail_type == "fire" and self.life < self.max_life//2:
-                color = (255, random.randint(150, 255), 0)
-            
-            if len(color) == 4:
-                s = pygame.Surface((self.size*2, self.size*2), pygame.SRCALPHA)
-                pygame.draw.circle(s, color, (self.size, self.size), self.size)
-                surface.blit(s, (self.x - scroll[0] - self.size, self.y - scroll[1] - self.size))
+        shadow, fire = self.KINDS["shadow"], self.KINDS["fire"]
+        randint = self.rng.randint
+        for i in range(self.count):
+            size = self.size[i]
+            x = self.x[i] - scroll[0]
+            y = self.y[i] - scroll[1]
+            kind = self.kind[i]
+            if kind == shadow:
+                alpha = min(255, 255 * self.life[i] // self.max_life[i])
+                surface.blit(self.shadow_sprite(size, alpha), (x - size, y - size))
             else:
-                pygame.draw.circle(surface, color, 
-                                 (int(self.x - scroll[0]), int(self.y - scroll[1])), 
-                                 self.size)
+                green = self.green[i]
+                if kind == fire and self.life[i] < self.max_life[i] // 2:
+                    green = randint(150, 255)
+                pygame.draw.circle(surface, (self.red[i], green, self.blue[i]), (int(x), int(y)), size)
+
+class CoinStore:
+    """Live coins as arrays of top-left positions, kept in the order they were added (lowest first)."""
+    
+    SIZE = 20
+    SPIN_FRAMES = 72
+    SPIN_MS = 3600
+    spin_sprites = None
+    plain_sprite = None
+    
+    def __init__(self):
+        self.x = array("i")
+        self.y = array("i")
+    
+    def __len__(self):
+        return len(self.y)
+    
+    def clear(self):
+        del self.x[:]
+        del self.y[:]
+    
+    def add(self, x, y):
+        self.x.append(x)
+        self.y.append(y)
+    
+    def collect(self, rect):
+        # Same overlap rule as Rect.colliderect; returns how many were picked up.
+        # Coins are added bottom to top, so y only falls along the arrays and
+        # the scan stops at the first coin above the rect.
+        top, bottom = rect.top - self.SIZE, rect.bottom
+        left, right = rect.left - self.SIZE, rect.right
+        hits = []
+        for i, y in enumerate(self.y):
+            if y >= bottom:
+                continue
+            if y <= top:
+                break
+            if left < self.x[i] < right:
+                hits.append(i)
+        for i in reversed(hits):
+            del self.x[i]
+            del self.y[i]
+        return len(hits)
+    
+    def cull(self, max_y):
+        # The lowest coins come first, so the ones at or below max_y are a prefix
+        ys = self.y
+        culled = 0
+        while culled < len(ys) and ys[culled] >= max_y:
+            culled += 1
+        if culled:
+            del self.x[:culled]
+            del self.y[:culled]
+    
+    @classmethod
+    def spin_frames(cls):
+        # The shine orbits the coin once every SPIN_MS; one sprite per step
+        if cls.spin_sprites is None:
+            baked = [baked_atlas.get(f"coin:{i}") for i in range(cls.SPIN_FRAMES)]
+            if None not in baked:
+                cls.spin_sprites = baked
+                return baked
+            cls.spin_sprites = []
+            for i in range(cls.SPIN_FRAMES):
+                sprite = pygame.Surface((42, 42), pygame.SRCALPHA)
+                angle = 2 * math.pi * i / cls.SPIN_FRAMES
+                pygame.draw.circle(sprite, GOLD, (21, 21), 10)
+                pygame.draw.circle(sprite, (255, 255, 0), (21, 21), 8)
+                pygame.draw.circle(sprite, (255, 255, 200), (int(21 + 15 * math.cos(angle)), int(21 + 15 * math.sin(angle))), 5)
+                cls.spin_sprites.append(sprite)
+        return cls.spin_sprites
+    
+    @classmethod
+    def plain_frame(cls):
+        # The coin without its shine, for the lower quality tiers
+        if cls.plain_sprite is None:
+            sprite = baked_atlas.get("coin:plain")
+            if sprite is None:
+                sprite = pygame.Surface((42, 42), pygame.SRCALPHA)
+                pygame.draw.circle(sprite, GOLD, (21, 21), 10)
+                pygame.draw.circle(sprite, (255, 255, 0), (21, 21), 8)
+            cls.plain_sprite = sprite
+        return cls.plain_sprite
+    
+    def draw(self, surface, scroll, ticks):
+        if not self.y:
+            return
+        if quality.settings["coin_shine"]:
+            frames = self.spin_frames()
+            sprite = frames[ticks % self.SPIN_MS * self.SPIN_FRAMES // self.SPIN_MS]
+        else:
+            sprite = self.plain_frame()
+        half = self.SIZE // 2
+        height = surface.get_height()
+        blits = []
+        for x, y in zip(self.x, self.y):
+            y = int(y + half - scroll[1]) - 21
+            if -42 < y < height:
+                blits.append((sprite, (int(x + half - scroll[0]) - 21, y)))
+        surface.blits(blits, False)
 
 class Cloud:
-    def __init__(self, x, y):
+    def __init__(self, x, y, rng=random):
         self.x = x
         self.y = y
-        self.speed = random.uniform(0.2, 0.5)
-        self.size = random.randint(50, 150)
+        self.size = rng.randint(50, CLOUD_MAX_SIZE)
         self.parts = []
-        for _ in range(random.randint(3, 6)):
-            part_size = random.randint(self.size//3, self.size//2)
-            offset_x = random.randint(-self.size//2, self.size//2)
-            offset_y = random.randint(-self.size//4, self.size//4)
+        for _ in range(rng.randint(3, 6)):
+            part_size = rng.randint(self.size//3, self.size//2)
+            offset_x = rng.randint(-self.size//2, self.size//2)
+            offset_y = rng.randint(-self.size//4, self.size//4)
             self.parts.append((offset_x, offset_y, part_size))
+        self.sprite = self.bake()
+    
+    def bake(self):
+        # Parts stay within size of the centre, which sits at (size, size)
+        sprite = pygame.Surface((self.size * 2, self.size * 2), pygame.SRCALPHA)
+        for offset_x, offset_y, part_size in self.parts:
+            center = (self.size + offset_x, self.size + offset_y)
+            pygame.draw.circle(sprite, (240, 240, 255, 200), center, part_size)
+            pygame.draw.circle(sprite, (255, 255, 255, 200), (center[0] - 5, center[1] - 5), part_size - 5)
+        return sprite
+    
+    def draw(self, surface, pos):
+        surface.blit(self.sprite, (pos[0] - self.size, pos[1] - self.size))
+
+class CloudLayer:
+    """Clouds baked into one wrapping strip that drifts and scrolls with a single blit."""
+    
+    PARALLAX = (0.2, 0.1)
+    
+    def __init__(self, count, rng=random):
+        self.period = SCREEN_WIDTH + 2 * CLOUD_MAX_SIZE
+        self.top = 50 - CLOUD_MAX_SIZE
+        height = SCREEN_HEIGHT // 3 + CLOUD_MAX_SIZE - self.top
+        self.clouds = [Cloud(rng.randint(0, self.period), rng.randint(50, SCREEN_HEIGHT // 3), rng)
+                       for _ in range(count)]
+        self.speed = sum(CLOUD_SPEED_RANGE) / 2
+        self.drift = 0.0
+        
+        # One period plus a screen width, so any window onto it is contiguous
+        self.strip = pygame.Surface((self.period + SCREEN_WIDTH, height), pygame.SRCALPHA)
+        for cloud in self.clouds:
+            for x in (cloud.x - self.period, cloud.x, cloud.x + self.period):
+                cloud.draw(self.strip, (x, cloud.y - self.top))
+        if pygame.display.get_surface() is not None:
+            self.strip = self.strip.convert_alpha()
+        # Most of the strip is clear sky; run-length encoding lets blits skip it
+        self.strip.set_alpha(255, pygame.RLEACCEL)
     
     def update(self):
-        self.x += self.speed
-        if self.x > SCREEN_WIDTH + self.size:
-            self.x = -self.size
-            self.y = random.randint(50, SCREEN_HEIGHT//3)
+        self.drift = (self.drift + self.speed) % self.period
     
     def draw(self, surface, scroll):
-        for offset_x, offset_y, part_size in self.parts:
-            pos_x = self.x + offset_x - scroll[0] * 0.2
-            pos_y = self.y + offset_y - scroll[1] * 0.1
-            pygame.draw.circle(surface, (240, 240, 255, 200), 
-                             (int(pos_x), int(pos_y)), part_size)
-            pygame.draw.circle(surface, (255, 255, 255, 200), 
-                             (int(pos_x)-5, int(pos_y)-5), part_size-5)
+        src_x = int(scroll[0] * self.PARALLAX[0] - self.drift) % self.period
+        y = int(self.top - scroll[1] * self.PARALLAX[1])
+        if y < surface.get_height():
+            surface.blit(self.strip, (0, y), (src_x, 0, surface.get_width(), self.strip.get_height()))
 
 class Button:
     def __init__(self, x, y, width, height, text, color, hover_color, text_color=BLACK):
@@ -247,17 +1427,27 @@ class Button:
         self.color = color
         self.hover_color = hover_color
         self.text_color = text_color
-        self.font = pygame.font.SysFont("Arial", 30)
         self.is_hovered = False
+        self.surfaces = {}
+    
+    def render(self, hovered):
+        # Both looks are baked on first use; drawing is then a single blit
+        button = self.surfaces.get(hovered)
+        if button is None:
+            button = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+            area = button.get_rect()
+            pygame.draw.rect(button, self.hover_color if hovered else self.color, area, border_radius=10)
+            pygame.draw.rect(button, BLACK, area, 2, border_radius=10)
+            
+            text_surface = text_cache.render(self.text, 30, self.text_color)
+            button.blit(text_surface, text_surface.get_rect(center=area.center))
+            if pygame.display.get_surface() is not None:
+                button = button.convert_alpha()
+            self.surfaces[hovered] = button
+        return button
     
     def draw(self, surface):
-        color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(surface, color, self.rect, border_radius=10)
-        pygame.draw.rect(surface, BLACK, self.rect, 2, border_radius=10)
-        
-        text_surface = self.font.render(self.text, True, self.text_color)
-        text_rect = text_surface.get_rect(center=self.rect.center)
-        surface.blit(text_surface, text_rect)
+        surface.blit(self.render(self.is_hovered), self.rect)
     
     def check_hover(self, pos):
         self.is_hovered = self.rect.collidepoint(pos)
@@ -267,72 +1457,88 @@ class Button:
         return self.rect.collidepoint(pos) and click
 
 class Player:
-    def __init__(self, x, y):
+    def __init__(self, x, y, fx_rng=random):
+        self.fx_rng = fx_rng
         self.width = PLAYER_WIDTH
         self.height = PLAYER_HEIGHT
         self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.current_skin = "bach"
+        self.current_trail = "none"
+        self.image, self.flipped_image = skin_registry.get(self.current_skin)[:2]
+        self.trail_particles = ParticleStore(rng=fx_rng)
+        self.reset(x, y)
+    
+    def reset(self, x, y):
+        # Start a new run in place; the equipped skin and trail carry over
+        self.place(x, y)
         self.vel_y = 0
         self.vel_x = 0
         self.jumping = True
         self.flip = False
-        self.current_skin = "bach"
-        self.current_trail = "none"
-        self.skins = self.load_skins()
-        self.image = self.skins[self.current_skin]
         self.on_moving_platform = None
-        self.trail_particles = []
+        self.trail_particles.clear()
         self.trail_timer = 0
     
-    def load_skins(self):
-        return {
-            "bach": create_player_skin((50, 50, 150), "bach"),
-            "default": create_player_skin((200, 100, 50), "default"),
-            "classic": create_player_skin((200, 100, 50), "classic"),
-            "ninja": create_player_skin(BLACK, "ninja"),
-            "robot": create_player_skin((150, 150, 150), "robot"),
-            "wizard": create_player_skin((100, 50, 150), "wizard")
-        }
+    def place(self, x, y):
+        # Position is kept in floats so fractional per-tick speeds add up
+        # exactly at any sim rate; the rect holds it rounded once per step
+        self.x = x
+        self.y = y
+        self.rect.topleft = (x, y)
+        self.prev_pos = self.rect.topleft
+    
+    def stand_on(self, rect):
+        self.place(rect.centerx - self.width // 2, rect.top - self.height)
     
     def set_skin(self, skin_name):
-        if skin_name in self.skins:
+        if skin_name in skin_registry:
             self.current_skin = skin_name
-            self.image = self.skins[skin_name]
+            self.image, self.flipped_image = skin_registry.get(skin_name)[:2]
     
     def set_trail(self, trail_type):
         if trail_type in TRAIL_TYPES:
             self.current_trail = trail_type
-            self.trail_particles = []
+            self.trail_particles.clear()
     
     def add_trail_particle(self):
         if self.current_trail != "none":
-            x = self.rect.centerx + random.randint(-5, 5)
-            y = self.rect.centery + random.randint(-5, 5)
-            self.trail_particles.append(TrailParticle(x, y, self.current_trail))
+            x = self.rect.centerx + self.fx_rng.randint(-5, 5)
+            y = self.rect.centery + self.fx_rng.randint(-5, 5)
+            self.trail_particles.emit(x, y, self.current_trail)
     
     def update_trail(self):
-        self.trail_timer += 1
-        if self.trail_timer >= 3:
-            self.add_trail_particle()
+        interval = quality.settings["trail_interval_ms"]
+        # Counted in ms * SIM_HZ (one tick adds 1000) so the spacing stays exact
+        # even when the interval isn't a whole number of ticks
+        self.trail_timer += 1000
+        if interval is None:
             self.trail_timer = 0
+        elif self.trail_timer >= interval * SIM_HZ:
+            self.add_trail_particle()
+            self.trail_timer %= interval * SIM_HZ
         
-        self.trail_particles = [p for p in self.trail_particles if p.update()]
+        self.trail_particles.update()
     
     def move(self, dx, platforms):
         self.vel_x = dx * PLAYER_SPEED
         if dx != 0:
             self.flip = dx < 0
         
-        self.rect.x += self.vel_x
+        prev_rect = self.rect.copy()
+        self.x += self.vel_x
+        self.rect.x = self.x
         
-        for platform in platforms:
+        for platform in platforms.query(self.rect.union(prev_rect)):
             if self.rect.colliderect(platform.rect):
                 if self.vel_x > 0 and self.rect.right > platform.rect.left and self.rect.left < platform.rect.left:
                     self.rect.right = platform.rect.left
+                    self.x = self.rect.x
                 elif self.vel_x < 0 and self.rect.left < platform.rect.right and self.rect.right > platform.rect.right:
                     self.rect.left = platform.rect.right
+                    self.x = self.rect.x
         
-        self.rect.left = max(0, self.rect.left)
-        self.rect.right = min(SCREEN_WIDTH, self.rect.right)
+        self.x = min(max(self.x, 0), SCREEN_WIDTH - self.width)
+        self.rect.x = self.x
     
     def jump(self):
         if not self.jumping:
@@ -342,15 +1548,20 @@ class Player:
     
     def apply_gravity(self, platforms, scroll):
         self.vel_y += GRAVITY
-        self.rect.y += self.vel_y
+        prev_rect = self.rect.copy()
+        self.y += self.vel_y
+        self.rect.y = self.y
         
         self.jumping = True
         self.on_moving_platform = None
         
-        for platform in platforms:
+        # Landing and head bumps nudge the rect by up to half a platform, so
+        # widen the broad phase enough to cover those corrections
+        for platform in platforms.query(self.rect.union(prev_rect).inflate(0, 40)):
             if self.rect.colliderect(platform.rect):
                 if self.vel_y >= 0 and self.rect.bottom <= platform.rect.centery:
                     self.rect.bottom = platform.rect.top
+                    self.y = self.rect.y
                     self.vel_y = 0
                     self.jumping = False
                     if platform.is_moving:
@@ -358,66 +1569,313 @@ class Player:
                 
                 elif self.vel_y < 0 and self.rect.top >= platform.rect.centery:
                     self.rect.top = platform.rect.bottom
+                    self.y = self.rect.y
                     self.vel_y = 0
         
         if self.on_moving_platform:
-            self.rect.x += self.on_moving_platform.speed * self.on_moving_platform.move_dir
+            self.x += self.on_moving_platform.speed * self.on_moving_platform.move_dir
+            self.rect.x = self.x
         
         if self.rect.top > SCREEN_HEIGHT + scroll[1]:
             return True
         return False
     
-    def draw(self, surface, scroll):
-        for particle in self.trail_particles:
-            particle.draw(surface, scroll)
+    def draw(self, surface, scroll, alpha=1.0):
+        self.trail_particles.draw(surface, scroll)
         
-        if self.flip:
-            flipped = pygame.transform.flip(self.image, True, False)
-            surface.blit(flipped, (self.rect.x - scroll[0], self.rect.y - scroll[1]))
-        else:
-            surface.blit(self.image, (self.rect.x - scroll[0], self.rect.y - scroll[1]))
+        x = lerp(self.prev_pos[0], self.rect.x, alpha) - scroll[0]
+        y = lerp(self.prev_pos[1], self.rect.y, alpha) - scroll[1]
+        surface.blit(self.flipped_image if self.flip else self.image, (x, y))
 
 class Platform:
-    def __init__(self, x, y, width, is_moving=False):
+    def __init__(self, x, y, width, motion=None, fx_rng=random):
         self.rect = pygame.Rect(x, y, width, 20)
-        self.type = random.choice(["wood", "grass", "stone"])
-        self.texture = create_platform_texture(width, self.type)
-        self.is_moving = is_moving
-        if is_moving:
-            self.move_dir = random.choice([-1, 1])
-            self.speed = random.uniform(1, 2)
-            self.move_dist = random.randint(50, 150)
+        self.reset(x, y, width, motion, fx_rng)
+    
+    def reset(self, x, y, width, motion=None, fx_rng=random):
+        self.rect.update(x, y, width, 20)
+        self.x = x
+        self.prev_x = x
+        self.type = fx_rng.choice(["wood", "grass", "stone"])
+        self.variant = fx_rng.randrange(PlatformTextureAtlas.VARIANTS)
+        self.texture = platform_atlas.sprite(self.type, width, self.variant)
+        self.is_moving = motion is not None
+        if self.is_moving:
+            self.move_dir, self.speed, self.move_dist = motion
             self.start_x = x
     
     def update(self):
         if self.is_moving:
-            prev_x = self.rect.x
-            self.rect.x += self.speed * self.move_dir
-            if abs(self.rect.x - self.start_x) > self.move_dist:
+            self.x += self.speed * self.move_dir
+            self.rect.x = self.x
+            if abs(self.x - self.start_x) > self.move_dist:
                 self.move_dir *= -1
     
-    def draw(self, surface, scroll):
-        shadow = pygame.Rect(
-            self.rect.x - scroll[0] + 3,
-            self.rect.y - scroll[1] + 3,
-            self.rect.width,
-            self.rect.height
-        )
-        pygame.draw.rect(surface, (0, 0, 0, 100), shadow, border_radius=5)
-        
-        platform_pos = (self.rect.x - scroll[0], self.rect.y - scroll[1])
-        surface.blit(self.texture, platform_pos)
-        
-        if self.type == "grass":
-            for i in range(0, self.rect.width, 5):
-                if random.random() < 0.3:
-                    grass_height = random.randint(3, 7)
-                    grass_x = self.rect.x - scroll[0] + i
-                    grass_y = self.rect.y - scroll[1] - grass_height + 3
-                    pygame.draw.line(surface, (random.randint(50, 150), random.randint(150, 200), 50),
-                                   (grass_x, grass_y), (grass_x, grass_y + grass_height), 2)
+    def draw(self, surface, scroll, alpha=1.0):
+        x = lerp(self.prev_x, self.rect.x, alpha) if self.is_moving else self.rect.x
+        platform_pos = (x - scroll[0], self.rect.y - scroll[1])
+        platform_atlas.blit(surface, self.texture, platform_pos, self.rect.width, quality.settings["shadows"])
+        
+        if self.type == "grass" and quality.settings["grass"]:
+            frame = pygame.time.get_ticks() // PlatformTextureAtlas.GRASS_FRAME_MS
+            grass = platform_atlas.grass_frame(self.rect.width, frame)
+            surface.blit(grass, (platform_pos[0], platform_pos[1] - 4), (0, 0, self.rect.width + 1, 8))
+
+class ObjectPool:
+    """Free list of released objects, handed back out after being reset in place."""
+    
+    def __init__(self, create, reset):
+        self.create = create
+        self.reset = reset
+        self.free = []
+    
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            self.reset(obj, *args)
+            return obj
+        return self.create(*args)
+    
+    def release(self, obj):
+        self.free.append(obj)
+    
+    def release_all(self, objs):
+        self.free.extend(objs)
+
+class PlatformIndex:
+    """Broad phase over live platforms, bucketed into horizontal bands by y.
+    
+    Queries return candidates in insertion order, so collision resolution
+    sees platforms in the same order as a scan over Game.platforms.
+    """
+    
+    BAND_HEIGHT = 100
+    
+    def __init__(self):
+        self.bands = {}
+        self.entries = {}
+        self.next_seq = 0
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def clear(self):
+        self.bands.clear()
+        self.entries.clear()
+    
+    def band_range(self, rect):
+        return rect.top // self.BAND_HEIGHT, (rect.bottom - 1) // self.BAND_HEIGHT
+    
+    def insert(self, platform):
+        first, last = self.band_range(platform.rect)
+        self.entries[platform] = (self.next_seq, first, last, platform.rect.y)
+        self.next_seq += 1
+        for band in range(first, last + 1):
+            self.bands.setdefault(band, []).append(platform)
+    
+    def remove(self, platform):
+        seq, first, last, y = self.entries.pop(platform)
+        self.unlink(platform, first, last)
+    
+    def update(self, platform):
+        # Re-band a platform after it moves; horizontal movers keep their bands
+        seq, first, last, y = self.entries[platform]
+        if platform.rect.y == y:
+            return
+        new_first, new_last = self.band_range(platform.rect)
+        if (new_first, new_last) != (first, last):
+            self.unlink(platform, first, last)
+            for band in range(new_first, new_last + 1):
+                self.bands.setdefault(band, []).append(platform)
+        self.entries[platform] = (seq, new_first, new_last, platform.rect.y)
+    
+    def unlink(self, platform, first, last):
+        for band in range(first, last + 1):
+            members = self.bands[band]
+            members.remove(platform)
+            if not members:
+                del self.bands[band]
+    
+    def query(self, rect):
+        first, last = self.band_range(rect)
+        found = set()
+        for band in range(first, last + 1):
+            for platform in self.bands.get(band, ()):
+                if platform.rect.colliderect(rect):
+                    found.add(platform)
+        return sorted(found, key=lambda p: self.entries[p][0])
+    
+    def query_band(self, top, bottom):
+        first, last = top // self.BAND_HEIGHT, (bottom - 1) // self.BAND_HEIGHT
+        found = set()
+        for band in range(first, last + 1):
+            found.update(self.bands.get(band, ()))
+        return sorted(found, key=lambda p: self.entries[p][0])
+
+class LevelStream:
+    """Builds the level ahead of the camera, one chunk of platforms and coins at a time.
+    
+    Specs come from roll_platform continuing from the tracked frontier, so no
+    scan of live platforms is needed. Building the Platform objects is split
+    into small steps that prepare() runs in idle time between frames.
+    """
+    
+    def __init__(self, rng, fx_rng, frontier, platform_pool):
+        self.rng = rng
+        self.fx_rng = fx_rng
+        self.frontier = frontier
+        self.platform_pool = platform_pool
+        self.ready = deque()
+        self.building = []
+        self.builder = self.build_chunks()
+    
+    def chunk_specs(self):
+        while True:
+            chunk = []
+            for _ in range(CHUNK_PLATFORMS):
+                spec = roll_platform(self.rng, *self.frontier)
+                self.frontier = spec[:4]
+                chunk.append(spec)
+            yield chunk
+    
+    def build_chunks(self):
+        # Yields None after each platform built, then the finished chunk
+        for chunk in self.chunk_specs():
+            for x, y, width, motion, coin_x in chunk:
+                platform = self.platform_pool.acquire(x, y, width, motion, self.fx_rng)
+                self.building.append((platform, (coin_x, y - 30) if coin_x is not None else None))
+                yield None
+            built, self.building = self.building, []
+            yield built
+    
+    def needs_work(self):
+        return len(self.ready) < LOOKAHEAD_CHUNKS * CHUNK_PLATFORMS
+    
+    def prepare(self):
+        chunk = next(self.builder)
+        if chunk is not None:
+            self.ready.extend(chunk)
+    
+    def next_platform(self):
+        while not self.ready:
+            self.prepare()
+        return self.ready.popleft()
+    
+    def release(self):
+        # Hand prepared but unused platforms back when the run ends, including
+        # those of a chunk still being built
+        self.platform_pool.release_all(platform for platform, coin in self.ready)
+        self.platform_pool.release_all(platform for platform, coin in self.building)
+        self.ready.clear()
+        self.building = []
+
+async def warm_assets(game):
+    # Runs alongside main(): spend a little of each frame on deferred assets
+    steps = game.warm_up()
+    while True:
+        deadline = time.perf_counter() + WARM_BUDGET_MS / 1000
+        for _ in steps:
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            break
+        await asyncio.sleep(0)
+    print(f"Startup: assets ready after {startup.mark('assets'):.0f} ms")
+
+async def prefetch_level(game):
+    # Runs alongside main(): top up the level stream whenever the loop is idle
+    while True:
+        if game.state == "playing" and game.level.needs_work():
+            game.level.prepare()
+        await asyncio.sleep(0)
+
+class Replay:
+    """A run's seed plus its per-tick input bitmasks, run-length encoded.
+    
+    File layout (little endian): magic, format version, sim rate, seed and
+    tick count, then one (mask byte, varint count) pair per run of ticks.
+    """
+    
+    MAGIC = b"DLDR"
+    # Bumped when a seed or its inputs no longer produce the same run
+    VERSION = 4
+    HEADER = struct.Struct("<4sBHQI")
+    
+    def __init__(self, seed, sim_hz=None):
+        self.seed = seed
+        self.sim_hz = sim_hz or SIM_HZ
+        self.runs = []
+        self.ticks = 0
+    
+    def record(self, inputs):
+        if self.runs and self.runs[-1][0] == inputs:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([inputs, 1])
+        self.ticks += 1
+    
+    def inputs(self):
+        for mask, count in self.runs:
+            for _ in range(count):
+                yield mask
+    
+    def to_bytes(self):
+        out = bytearray(self.HEADER.pack(self.MAGIC, self.VERSION, self.sim_hz, self.seed, self.ticks))
+        for mask, count in self.runs:
+            out.append(mask)
+            while count >= 0x80:
+                out.append((count & 0x7F) | 0x80)
+                count >>= 7
+            out.append(count)
+        return bytes(out)
+    
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, sim_hz, seed, ticks = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError("not a replay file")
+        if version != cls.VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+        
+        replay = cls(seed, sim_hz)
+        pos = cls.HEADER.size
+        while pos < len(data):
+            mask = data[pos]
+            pos += 1
+            count = shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                count |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            replay.runs.append([mask, count])
+            replay.ticks += count
+        if replay.ticks != ticks:
+            raise ValueError("truncated replay")
+        return replay
+    
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+    
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data.startswith(b'"'):
+            # A last_replay entry saved by ProfileStore (JSON-wrapped base64)
+            data = base64.b64decode(json.loads(data))
+        return cls.from_bytes(data)
 
 class ShopItem:
+    """A shop card, pre-rendered once per (owned, equipped) look and preview frame."""
+    
+    PREVIEW_FRAMES = 8
+    PREVIEW_FRAME_MS = 100
+    ANIMATED = ("sparkle", "rainbow")
+    
     def __init__(self, name, price, x, y, item_type="skin"):
         self.name = name
         self.price = price
@@ -425,80 +1883,334 @@ class ShopItem:
         self.owned = False
         self.equipped = False
         self.item_type = item_type
+        self.cards = {}
+    
+    @classmethod
+    def preview_frame(cls, ticks):
+        return ticks // cls.PREVIEW_FRAME_MS % cls.PREVIEW_FRAMES
     
-    def draw(self, surface, player_skins=None):
+    @property
+    def animated(self):
+        return self.item_type == "trail" and self.name in self.ANIMATED
+    
+    def card(self, frame=0):
+        # Keyed by look, so buying or equipping picks up a different card and
+        # the old one stays around for when the state comes back
+        key = (self.owned, self.equipped, frame if self.animated else 0)
+        card = self.cards.get(key)
+        if card is None:
+            card = self.render_card(key[2])
+            if pygame.display.get_surface() is not None:
+                card = card.convert_alpha()
+            self.cards[key] = card
+        return card
+    
+    def render_card(self, frame):
+        price_text = None if self.owned else text_cache.render(f"{self.price} coins", 20, BLACK)
+        height = self.rect.height if price_text is None else max(self.rect.height, 145 + price_text.get_height())
+        card = pygame.Surface((self.rect.width, height), pygame.SRCALPHA)
+        rect = pygame.Rect((0, 0), self.rect.size)
+        
         color = (200, 200, 200) if not self.owned else (100, 200, 100)
         if self.equipped:
             color = (100, 100, 200)
-        pygame.draw.rect(surface, color, self.rect, border_radius=10)
-        pygame.draw.rect(surface, BLACK, self.rect, 2, border_radius=10)
-        
-        font = pygame.font.SysFont("Arial", 20)
+        pygame.draw.rect(card, color, rect, border_radius=10)
+        pygame.draw.rect(card, BLACK, rect, 2, border_radius=10)
         
         if self.item_type == "skin":
-            preview_img = pygame.transform.scale(player_skins[self.name], (60, 90))
-            surface.blit(preview_img, (self.rect.centerx - 30, self.rect.y + 10))
+            card.blit(skin_registry.preview(self.name), (rect.centerx - 30, rect.y + 10))
             
-            name_text = font.render(self.name.capitalize(), True, BLACK)
-            surface.blit(name_text, (self.rect.centerx - name_text.get_width()//2, self.rect.y + 105))
+            name_text = text_cache.render(self.name.capitalize(), 20, BLACK)
+            card.blit(name_text, (rect.centerx - name_text.get_width()//2, rect.y + 105))
         else:
             if self.name == "none":
-                name_text = font.render("No Trail", True, BLACK)
-                surface.blit(name_text, (self.rect.centerx - name_text.get_width()//2, self.rect.y + 60))
+                name_text = text_cache.render("No Trail", 20, BLACK)
+                card.blit(name_text, (rect.centerx - name_text.get_width()//2, rect.y + 60))
             else:
+                # Animated previews loop through PREVIEW_FRAMES fixed frames
+                rng = random.Random(f"{self.name}:{frame}")
                 if self.name == "sparkle":
                     for _ in range(10):
-                        x = random.randint(self.rect.left + 10, self.rect.right - 10)
-                        y = random.randint(self.rect.top + 10, self.rect.bottom - 10)
-                        pygame.draw.circle(surface, (random.randint(200, 255), random.randint(200, 255), random.randint(100, 200)), 
-                                         (x, y), random.randint(2, 4))
+                        x = rng.randint(rect.left + 10, rect.right - 10)
+                        y = rng.randint(rect.top + 10, rect.bottom - 10)
+                        pygame.draw.circle(card, (rng.randint(200, 255), rng.randint(200, 255), rng.randint(100, 200)), 
+                                         (x, y), rng.randint(2, 4))
                 elif self.name == "fire":
-                    pygame.draw.circle(surface, (255, 100, 0), (self.rect.centerx, self.rect.centery), 15)
-                    pygame.draw.circle(surface, (255, 200, 0), (self.rect.centerx, self.rect.centery), 10)
+                    pygame.draw.circle(card, (255, 100, 0), (rect.centerx, rect.centery), 15)
+                    pygame.draw.circle(card, (255, 200, 0), (rect.centerx, rect.centery), 10)
                 elif self.name == "shadow":
                     s = pygame.Surface((80, 80), pygame.SRCALPHA)
                     pygame.draw.circle(s, (50, 50, 50, 150), (40, 40), 20)
-                    surface.blit(s, (self.rect.centerx - 40, self.rect.centery - 40))
+                    card.blit(s, (rect.centerx - 40, rect.centery - 40))
                 elif self.name == "rainbow":
                     for i in range(5):
-                        color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-                        pygame.draw.circle(surface, color, 
-                                         (self.rect.centerx - 20 + i*10, self.rect.centery), 
-                                         random.randint(3, 5))
+                        color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+                        pygame.draw.circle(card, color, 
+                                         (rect.centerx - 20 + i*10, rect.centery), 
+                                         rng.randint(3, 5))
             
-            name_text = font.render(self.name.capitalize(), True, BLACK)
-            surface.blit(name_text, (self.rect.centerx - name_text.get_width()//2, self.rect.y + 125))
+            name_text = text_cache.render(self.name.capitalize(), 20, BLACK)
+            card.blit(name_text, (rect.centerx - name_text.get_width()//2, rect.y + 125))
         
-        if not self.owned:
-            price_text = font.render(f"{self.price} coins", True, BLACK)
-            surface.blit(price_text, (self.rect.centerx - price_text.get_width()//2, self.rect.y + 145))
+        if price_text is not None:
+            card.blit(price_text, (rect.centerx - price_text.get_width()//2, rect.y + 145))
+        return card
+    
+    def draw(self, surface, ticks=0):
+        surface.blit(self.card(self.preview_frame(ticks)), self.rect)
+
+class ProfileStore:
+    """Saved player data, loaded once and written behind on a debounce.
+    
+    Every key is stored as JSON under dontlookdown_<key>, the same layout as
+    SaveSystem in web/save_handler.js: in localStorage on the web, or as a
+    file written to a temp file and renamed into place locally.
+    """
+    PREFIX = "dontlookdown_"
+    FLUSH_DELAY = 1.0
+    POLL_INTERVAL = 0.25
+    LEGACY_FILES = {"prefs": "player_prefs.json"}
+    
+    def __init__(self, persist=True, directory="."):
+        self.persist = persist
+        self.directory = directory
+        self.data = {}
+        self.loaded = set()
+        self.dirty = set()
+        self.flush_at = None
+        self.in_flight = None
+    
+    def is_web(self):
+        return '__window__' in globals()
+    
+    def path(self, key):
+        return os.path.join(self.directory, f"{self.PREFIX}{key}.json")
+    
+    def get(self, key, default=None):
+        if key not in self.loaded:
+            self.loaded.add(key)
+            if self.persist:
+                value = self.read(key)
+                if value is not None:
+                    self.data[key] = value
+        return self.data.get(key, default)
+    
+    def set(self, key, value):
+        self.get(key)
+        if self.data.get(key) != value:
+            self.data[key] = value
+            self.mark_dirty(key)
+    
+    def update(self, key, **fields):
+        # Only fields whose value changed make the key dirty
+        record = dict(self.get(key) or {})
+        changed = [name for name, value in fields.items() if record.get(name) != value]
+        if changed:
+            record.update(fields)
+            self.data[key] = record
+            self.mark_dirty(key)
+        return changed
+    
+    def mark_dirty(self, key):
+        self.dirty.add(key)
+        if self.flush_at is None:
+            self.flush_at = time.monotonic() + self.FLUSH_DELAY
+    
+    def read(self, key):
+        try:
+            if self.is_web():
+                text = __window__.localStorage.getItem(self.PREFIX + key)
+            else:
+                path = self.path(key)
+                if not os.path.exists(path) and key in self.LEGACY_FILES:
+                    path = os.path.join(self.directory, self.LEGACY_FILES[key])
+                if not os.path.exists(path):
+                    return None
+                with open(path, 'r') as f:
+                    text = f.read()
+            return json.loads(text) if text else None
+        except Exception as e:
+            print(f"Error loading {key}: {e}")
+            return None
+    
+    def take_dirty(self):
+        # Serialise now, on the caller's thread, so writes see a consistent snapshot
+        items = [(key, json.dumps(self.data[key])) for key in sorted(self.dirty)]
+        self.dirty.clear()
+        self.flush_at = None
+        return items
+    
+    def write(self, items):
+        for key, text in items:
+            try:
+                if self.is_web():
+                    __window__.localStorage.setItem(self.PREFIX + key, text)
+                else:
+                    path = self.path(key)
+                    tmp = f"{path}.tmp"
+                    with open(tmp, 'w') as f:
+                        f.write(text)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp, path)
+            except Exception as e:
+                print(f"Error saving {key}: {e}")
+    
+    def flush(self):
+        # A write-behind still running holds older data for the same files;
+        # let it land first so this one, with the newest data, wins
+        if self.in_flight is not None:
+            self.in_flight.result()
+        if self.persist and self.dirty:
+            self.write(self.take_dirty())
+    
+    async def run(self):
+        # Write-behind loop started by main(); local file writes go to a worker thread
+        writer = None
+        try:
+            while True:
+                await asyncio.sleep(self.POLL_INTERVAL)
+                if not self.persist or self.flush_at is None or time.monotonic() < self.flush_at:
+                    continue
+                items = self.take_dirty()
+                if self.is_web():
+                    self.write(items)
+                    continue
+                if writer is None:
+                    writer = ThreadPoolExecutor(1, thread_name_prefix="profile-write")
+                self.in_flight = writer.submit(self.write, items)
+                await asyncio.wrap_future(self.in_flight)
+        finally:
+            if writer is not None:
+                writer.shutdown(wait=False)
+
+class LeaderboardClient:
+    """Sends finished runs to the local leaderboard service (leaderboard.py).
+    
+    submit() only queues the run; run() sends everything queued in one
+    request and keeps it for a retry while the service is unreachable.
+    """
+    POLL_INTERVAL = 0.25
+    RETRY_DELAY = 5.0
+    TIMEOUT = 2.0
+    MAX_PENDING = 100
+    
+    def __init__(self, enabled=True, host=LEADERBOARD_HOST, port=LEADERBOARD_PORT):
+        self.enabled = enabled
+        self.host = host
+        self.port = port
+        self.pending = []
+        self.retry_at = 0
+        self.reported = False
+    
+    def submit(self, run):
+        if self.enabled:
+            self.pending = (self.pending + [run])[-self.MAX_PENDING:]
+    
+    async def send(self, runs):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(json.dumps({"op": "submit", "runs": runs}).encode() + b"\n")
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        if "error" in reply:
+            raise ValueError(reply["error"])
+    
+    async def run(self):
+        # Started by main(); the game loop never waits on the network
+        while True:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            if not self.pending or time.monotonic() < self.retry_at:
+                continue
+            runs, self.pending = self.pending, []
+            try:
+                await asyncio.wait_for(self.send(runs), self.TIMEOUT)
+            except (OSError, ValueError, asyncio.TimeoutError) as e:
+                self.pending = (runs + self.pending)[-self.MAX_PENDING:]
+                self.retry_at = time.monotonic() + self.RETRY_DELAY
+                if not self.reported:
+                    print(f"Leaderboard unavailable, will retry: {e!r}")
+                    self.reported = True
 
 class Game:
-    def __init__(self):
-        self.reset()
+    def __init__(self, persist=True, seed=None):
+        self.persist = persist
+        self.profile = ProfileStore(persist)
+        # Gameplay randomness comes from self.rng, reseeded every run so a seed
+        # plus the recorded inputs reproduces it; looks-only randomness uses fx_rng
+        self.fx_rng = random.Random()
+        self.last_replay = None
+        # Runs reuse the player, platforms and coins instead of reallocating them
+        self.player = None
+        self.platforms = []
+        self.platform_index = PlatformIndex()
+        self.coins = CoinStore()
+        self.level = None
+        self.platform_pool = ObjectPool(Platform, Platform.reset)
+        self.reset(seed)
         self.state = "menu"
+        self.drawn_state = None
+        self.dirty = True
         self.total_coins = 0
         self.setup_menu()
         self.setup_shop()
-        self.clouds = [Cloud(random.randint(0, SCREEN_WIDTH), random.randint(50, SCREEN_HEIGHT//3)) for _ in range(5)]
+        self.setup_hud()
+        self.clouds = CloudLayer(CLOUD_COUNT, self.fx_rng)
+        self.background = BackgroundRenderer()
         self.load_player_prefs()
+        self.player_id = (self.profile.get('prefs') or {}).get('player') or f"{random.getrandbits(64):016x}"
+        # There are no sockets in the browser build, so only desktop runs are submitted
+        self.leaderboard = LeaderboardClient(persist and not self.profile.is_web())
     
-    def reset(self):
-        self.player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100)
-        self.platforms = []
-        self.coins = []
+    def warm_up(self):
+        # The menu needs none of this; main() builds it a step at a time after
+        # the first frame, and anything reached before then is built on demand
+        yield from platform_atlas.warm_steps()
+        for name in SkinRegistry.SKINS:
+            skin_registry.get(name)
+            yield
+        CoinStore.spin_frames()
+        yield
+        for item in self.shop_items:
+            item.card()
+            yield
+        for state in ("shop", "game_over"):
+            self.background.background(state, screen.get_size())
+            yield
+    
+    def reset(self, seed=None):
+        if seed is None:
+            seed = random.randrange(2**63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.replay = Replay(seed)
+        
+        if self.player is None:
+            self.player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100, self.fx_rng)
+        else:
+            self.player.reset(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100)
+        self.platform_pool.release_all(self.platforms)
+        self.platforms.clear()
+        self.platform_index.clear()
+        self.coins.clear()
+        if self.level is not None:
+            self.level.release()
         self.scroll = [0, 0]
         self.score = 0
         self.difficulty = 0
+        self.run_coins = 0
+        self.jump_requested = False
         
-        self.generate_platform(SCREEN_WIDTH // 2 - 50, SCREEN_HEIGHT - 50, 100)
-        for _ in range(MAX_PLATFORMS - 1):
-            self.generate_random_platform()
+        start = (SCREEN_WIDTH // 2 - 50, SCREEN_HEIGHT - 50, 100)
+        self.generate_platform(*start)
+        self.level = LevelStream(self.rng, self.fx_rng, start + (None,), self.platform_pool)
+        self.generate_platforms()
         
-        self.player.rect.bottom = self.platforms[0].rect.top
-        self.player.rect.centerx = self.platforms[0].rect.centerx
-        
-        self.load_player_prefs()
+        self.player.stand_on(self.platforms[0].rect)
+        self.prev_scroll = tuple(self.scroll)
     
     def setup_menu(self):
         button_width = 300
@@ -515,7 +2227,17 @@ class Game:
             center_x, 450, button_width, button_height,
             "QUIT", RED, (255, 100, 100))
     
+    def setup_hud(self):
+        self.score_label = TextLabel(30, BLACK, bold=True)
+        self.coins_label = TextLabel(30, GOLD, bold=True)
+        self.shop_coins_label = TextLabel(40, GOLD)
+        self.final_score_label = TextLabel(50, WHITE)
+        self.final_coins_label = TextLabel(50, GOLD)
+    
     def setup_shop(self):
+        self.show_saved_message = False
+        self.saved_message_timer = 0
+        self.drawn_preview_frame = None
         self.shop_items = [
             ShopItem("bach", 0, 150, 150),
             ShopItem("default", 100, 300, 150),
@@ -531,8 +2253,6 @@ class Game:
             ShopItem("rainbow", 250, 750, 350, "trail")
         ]
         
-        self.load_player_prefs()
-        
         self.save_button = Button(
             SCREEN_WIDTH // 2 - 150, 450, 300, 60,
             "SAVE SELECTIONS", (150, 200, 150), (200, 255, 200))
@@ -542,135 +2262,171 @@ class Game:
             "BACK TO MENU", (150, 150, 150), (200, 200, 200))
     
     def save_player_prefs(self):
-        prefs = {
-            'skin': self.player.current_skin,
-            'trail': self.player.current_trail,
-            'coins': self.total_coins,
-            'owned_skins': [item.name for item in self.shop_items 
-                           if item.owned and item.item_type == "skin"],
-            'owned_trails': [item.name for item in self.shop_items 
-                            if item.owned and item.item_type == "trail"]
-        }
-        
-        try:
-            # Web version uses localStorage
-            if '__window__' in globals():
-                __window__.localStorage.setItem('dontlookdown_prefs', json.dumps(prefs))
-                return True
-            # Fallback for testing locally
-            with open('player_prefs.json', 'w') as f:
-                json.dump(prefs, f)
-            return True
-        except Exception as e:
-            print(f"Error saving preferences: {e}")
+        # Queued in the profile store; the write happens later, off the frame
+        if not self.persist:
             return False
+        
+        self.profile.update(
+            'prefs',
+            player=self.player_id,
+            skin=self.player.current_skin,
+            trail=self.player.current_trail,
+            coins=self.total_coins,
+            owned_skins=[item.name for item in self.shop_items
+                         if item.owned and item.item_type == "skin"],
+            owned_trails=[item.name for item in self.shop_items
+                          if item.owned and item.item_type == "trail"])
+        return True
     
-    def load_player_prefs(self):
-        try:
-            # Web version
-            if '__window__' in globals():
-                prefs_str = __window__.localStorage.getItem('dontlookdown_prefs')
-                if prefs_str:
-                    prefs = json.loads(prefs_str)
-                else:
-                    return False
-            else:
-                # Local testing
-                if os.path.exists('player_prefs.json'):
-                    with open('player_prefs.json', 'r') as f:
-                        prefs = json.load(f)
-                else:
-                    return False
-            
-            if 'coins' in prefs:
-                self.total_coins = prefs['coins']
-            
-            if 'skin' in prefs:
-                self.player.set_skin(prefs['skin'])
-                for item in self.shop_items:
-                    if item.item_type == "skin":
-                        item.owned = item.name in prefs.get('owned_skins', [])
-                        item.equipped = (item.name == prefs['skin'])
-            
-            if 'trail' in prefs:
-                self.player.set_trail(prefs['trail'])
-                for item in self.shop_items:
-                    if item.item_type == "trail":
-                        item.owned = item.name in prefs.get('owned_trails', [])
-                        item.equipped = (item.name == prefs['trail'])
-            
-            return True
-        except Exception as e:
-            print(f"Error loading preferences: {e}")
+    def save_last_replay(self):
+        if not self.persist or self.last_replay is None:
             return False
+        
+        self.profile.set('last_replay', base64.b64encode(self.last_replay.to_bytes()).decode('ascii'))
+        return True
     
-    def generate_platform(self, x, y, width, is_moving=False):
-        self.platforms.append(Platform(x, y, width, is_moving))
+    def submit_run(self):
+        # The camera scrolls towards negative y, so score counts down as the
+        # player climbs; the board ranks height climbed
+        self.leaderboard.submit({
+            "player": self.player_id,
+            "score": -self.score,
+            "coins": self.run_coins,
+            "skin": self.player.current_skin,
+            "seed": self.seed,
+            "replay_hash": hashlib.sha1(self.replay.to_bytes()).hexdigest(),
+        })
     
-    def generate_random_platform(self):
-        if not self.platforms:
-            self.generate_platform(SCREEN_WIDTH // 2 - 50, SCREEN_HEIGHT - 50, 100)
-            return
-        
-        highest = min(self.platforms, key=lambda p: p.rect.y)
+    def load_player_prefs(self):
+        prefs = self.profile.get('prefs')
+        if not prefs:
+            return False
         
-        min_x = max(0, highest.rect.x - 200)
-        max_x = min(SCREEN_WIDTH - 100, highest.rect.x + 200)
-        x = random.randint(int(min_x), int(max_x))
+        if 'coins' in prefs:
+            self.total_coins = prefs['coins']
         
-        y = highest.rect.y - random.randint(MIN_PLATFORM_DIST, MAX_PLATFORM_DIST)
-        width = random.randint(*PLATFORM_WIDTH_RANGE)
-        is_moving = random.random() < 0.2
+        if 'skin' in prefs:
+            self.player.set_skin(prefs['skin'])
+            for item in self.shop_items:
+                if item.item_type == "skin":
+                    item.owned = item.name in prefs.get('owned_skins', [])
+                    item.equipped = (item.name == prefs['skin'])
         
-        self.generate_platform(x, y, width, is_moving)
+        if 'trail' in prefs:
+            self.player.set_trail(prefs['trail'])
+            for item in self.shop_items:
+                if item.item_type == "trail":
+                    item.owned = item.name in prefs.get('owned_trails', [])
+                    item.equipped = (item.name == prefs['trail'])
         
-        if random.random() < 0.3:
-            self.coins.append({
-                'rect': pygame.Rect(x + random.randint(20, width - 20), y - 30, 20, 20),
-                'collected': False
-            })
+        return True
     
-    def update(self):
+    def generate_platform(self, x, y, width, motion=None):
+        self.add_platform(self.platform_pool.acquire(x, y, width, motion, self.fx_rng))
+    
+    def add_platform(self, platform):
+        self.platforms.append(platform)
+        self.platform_index.insert(platform)
+    
+    def update(self, inputs=None):
         if self.state != "playing":
             return
         
-        for cloud in self.clouds:
-            cloud.update()
+        if inputs is None:
+            inputs = self.read_input()
+        self.replay.record(inputs)
         
+        self.save_previous_state()
+        self.update_clouds()
+        self.update_player(inputs)
+        self.update_platforms()
+        self.generate_platforms()
+        self.update_camera()
+        self.update_coins()
+    
+    def read_input(self):
+        keys = pygame.key.get_pressed()
+        inputs = 0
+        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+            inputs |= INPUT_LEFT
+        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+            inputs |= INPUT_RIGHT
+        if self.jump_requested:
+            inputs |= INPUT_JUMP
+            self.jump_requested = False
+        return inputs
+    
+    def update_clouds(self):
+        self.clouds.update()
+    
+    def update_player(self, inputs):
         self.player.update_trail()
         
-        keys = pygame.key.get_pressed()
+        if inputs & INPUT_JUMP:
+            self.player.jump()
+        
         dx = 0
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if inputs & INPUT_LEFT:
             dx = -1
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if inputs & INPUT_RIGHT:
             dx = 1
         
-        self.player.move(dx, self.platforms)
+        self.player.move(dx, self.platform_index)
         
-        if self.player.apply_gravity(self.platforms, self.scroll):
+        if self.player.apply_gravity(self.platform_index, self.scroll):
             self.state = "game_over"
             self.total_coins += self.score // 10
+            self.last_replay = self.replay
             self.save_player_prefs()
-        
+            self.save_last_replay()
+            self.submit_run()
+    
+    def update_platforms(self):
         for platform in self.platforms:
-            platform.update()
-        
-        self.platforms = [p for p in self.platforms if p.rect.y - self.scroll[1] < SCREEN_HEIGHT + 200]
-        self.coins = [c for c in self.coins if not c['collected'] and c['rect'].y - self.scroll[1] < SCREEN_HEIGHT + 100]
+            if platform.is_moving:
+                platform.update()
+                self.platform_index.update(platform)
         
+        # Platforms are appended bottom to top and never move vertically, so the
+        # ones below the screen are always a prefix of the list
+        culled = 0
+        for platform in self.platforms:
+            if platform.rect.y - self.scroll[1] < SCREEN_HEIGHT + 200:
+                break
+            self.platform_index.remove(platform)
+            self.platform_pool.release(platform)
+            culled += 1
+        del self.platforms[:culled]
+        self.coins.cull(self.scroll[1] + SCREEN_HEIGHT + 100)
+    
+    def generate_platforms(self):
         while len(self.platforms) < MAX_PLATFORMS:
-            self.generate_random_platform()
-        
+            platform, coin = self.level.next_platform()
+            self.add_platform(platform)
+            if coin is not None:
+                self.coins.add(*coin)
+    
+    def update_camera(self):
         if self.player.rect.top < SCROLL_THRESH + self.scroll[1]:
             self.scroll[1] = self.player.rect.top - SCROLL_THRESH
         
         self.score = int(self.scroll[1] / 10)
-        
-        for coin in self.coins[:]:
-            if not coin['collected'] and self.player.rect.colliderect(coin['rect']):
-                coin['collected'] = True
-                self.total_coins += 1
+    
+    def update_coins(self):
+        collected = self.coins.collect(self.player.rect)
+        self.run_coins += collected
+        self.total_coins += collected
+    
+    def save_previous_state(self):
+        self.prev_scroll = tuple(self.scroll)
+        self.player.prev_pos = self.player.rect.topleft
+        for platform in self.platforms:
+            if platform.is_moving:
+                platform.prev_x = platform.rect.x
+    
+    def render_scroll(self, alpha):
+        return (lerp(self.prev_scroll[0], self.scroll[0], alpha),
+                lerp(self.prev_scroll[1], self.scroll[1], alpha))
     
     def handle_events(self):
         mouse_pos = pygame.mouse.get_pos()
@@ -678,19 +2434,28 @@ class Game:
         
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
                 return False
             
+            if event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN, pygame.WINDOWEXPOSED,
+                              pygame.WINDOWRESTORED, pygame.WINDOWFOCUSGAINED, pygame.VIDEOEXPOSE):
+                self.dirty = True
+            
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
                     mouse_click = True
             
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE and self.state == "playing":
-                    self.player.jump()
+                    self.jump_requested = True
                 if event.key == pygame.K_RETURN and self.state == "game_over":
                     self.reset()
                     self.state = "playing"
+                if event.key == pygame.K_F3:
+                    profiler.toggle(self)
+                if event.key == pygame.K_F4 and profiler.enabled:
+                    profiler.export_trace()
+                if event.key == pygame.K_F5:
+                    recorder.toggle(screen)
                 if event.key == pygame.K_ESCAPE:
                     if self.state == "playing":
                         self.state = "menu"
@@ -698,9 +2463,7 @@ class Game:
                         self.state = "menu"
         
         if self.state == "menu":
-            self.play_button.check_hover(mouse_pos)
-            self.shop_button.check_hover(mouse_pos)
-            self.quit_button.check_hover(mouse_pos)
+            self.update_hover((self.play_button, self.shop_button, self.quit_button), mouse_pos)
             
             if self.play_button.is_clicked(mouse_pos, mouse_click):
                 self.reset()
@@ -711,8 +2474,7 @@ class Game:
                 return False
         
         elif self.state == "shop":
-            self.back_button.check_hover(mouse_pos)
-            self.save_button.check_hover(mouse_pos)
+            self.update_hover((self.back_button, self.save_button), mouse_pos)
             
             for item in self.shop_items:
                 if item.rect.collidepoint(mouse_pos) and mouse_click:
@@ -760,151 +2522,165 @@ class Game:
         
         return True
     
-    def draw(self):
-        for y in range(SCREEN_HEIGHT):
-            shade = min(255, 135 + y // 4)
-            pygame.draw.line(screen, (shade, min(255, 206 + y // 8), min(255, 235 + y // 12)), 
-                           (0, y), (SCREEN_WIDTH, y))
+    def update_hover(self, buttons, mouse_pos):
+        for button in buttons:
+            was_hovered = button.is_hovered
+            if button.check_hover(mouse_pos) != was_hovered:
+                self.dirty = True
+    
+    def needs_redraw(self):
+        # Menu, shop and game over only change on input, a state change, a new
+        # shop preview frame or when the "Saved!" message runs out
+        if self.state == "playing" or profiler.enabled:
+            return True
+        if self.dirty or self.drawn_state != self.state:
+            return True
+        if self.state == "shop" and ShopItem.preview_frame(pygame.time.get_ticks()) != self.drawn_preview_frame:
+            return True
+        return self.show_saved_message and pygame.time.get_ticks() - self.saved_message_timer >= 2000
+    
+    def draw(self, alpha=1.0):
+        self.dirty = False
+        self.drawn_state = self.state
+        self.draw_background()
         
         if self.state == "playing":
-            for cloud in self.clouds:
-                cloud.draw(screen, self.scroll)
-            
-            for platform in self.platforms:
-                platform.draw(screen, self.scroll)
-            
-            for coin in self.coins:
-                if not coin['collected']:
-                    pos_x = coin['rect'].centerx - self.scroll[0]
-                    pos_y = coin['rect'].centery - self.scroll[1]
-                    
-                    angle = (pygame.time.get_ticks() // 10) % 360
-                    rad_angle = math.radians(angle)
-                    shine_x = pos_x + 15 * math.cos(rad_angle)
-                    shine_y = pos_y + 15 * math.sin(rad_angle)
-                    
-                    pygame.draw.circle(screen, GOLD, (int(pos_x), int(pos_y)), 10)
-                    pygame.draw.circle(screen, (255, 255, 0), (int(pos_x), int(pos_y)), 8)
-                    pygame.draw.circle(screen, (255, 255, 200, 100), (int(shine_x), int(shine_y)), 5)
-            
-            self.player.draw(screen, self.scroll)
-            
-            font = pygame.font.SysFont("Arial", 30, bold=True)
-            score_text = font.render(f"Score: {self.score}", True, BLACK)
-            pygame.draw.rect(screen, (255, 255, 255, 150), (15, 15, score_text.get_width() + 10, score_text.get_height() + 10), border_radius=5)
-            screen.blit(score_text, (20, 20))
-            
-            coins_text = font.render(f"Coins: {self.total_coins}", True, GOLD)
-            pygame.draw.rect(screen, (255, 255, 255, 150), (15, 55, coins_text.get_width() + 10, coins_text.get_height() + 10), border_radius=5)
-            screen.blit(coins_text, (20, 60))
-        
+            scroll = self.render_scroll(alpha)
+            self.draw_clouds(scroll)
+            self.draw_platforms(scroll, alpha)
+            self.draw_coins(scroll)
+            self.draw_player(scroll, alpha)
+            self.draw_hud()
         elif self.state == "menu":
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((255, 255, 255, 150))
-            screen.blit(overlay, (0, 0))
-            
-            for cloud in self.clouds:
-                cloud.draw(screen, (0, 0))
-            
-            title_font = pygame.font.SysFont("Arial", 60, bold=True)
-            title_text = title_font.render("DON'T LOOK DOWN", True, BLACK)
-            shadow_text = title_font.render("DON'T LOOK DOWN", True, (100, 100, 100, 150))
-            screen.blit(shadow_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2 + 3, 103))
-            screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 100))
-            
-            self.play_button.draw(screen)
-            self.shop_button.draw(screen)
-            self.quit_button.draw(screen)
-            
-            instr_font = pygame.font.SysFont("Arial", 24)
-            instructions = [
-                "Climb as high as you can!",
-                "Use LEFT/RIGHT or A/D to move",
-                "Press SPACE to jump",
-                "Collect coins to buy skins & trails",
-                "Don't fall off the screen!"
-            ]
-            
-            pygame.draw.rect(screen, (255, 255, 255, 180), 
-                           (SCREEN_WIDTH // 2 - 200, 520, 400, len(instructions) * 30 + 10), 
-                           border_radius=10)
-            
-            for i, line in enumerate(instructions):
-                text = instr_font.render(line, True, BLACK)
-                screen.blit(text, (SCREEN_WIDTH // 2 - text.get_width() // 2, 530 + i * 30))
-        
+            self.draw_menu()
         elif self.state == "shop":
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((200, 220, 255, 200))
-            screen.blit(overlay, (0, 0))
-            
-            title_font = pygame.font.SysFont("Arial", 60, bold=True)
-            title_text = title_font.render("SKIN SHOP", True, (50, 50, 150))
-            screen.blit(title_text, (SCREEN_WIDTH // 2 - title_text.get_width() // 2, 50))
-            
-            coins_font = pygame.font.SysFont("Arial", 40)
-            coins_text = coins_font.render(f"Coins: {self.total_coins}", True, GOLD)
-            pygame.draw.circle(screen, GOLD, (SCREEN_WIDTH // 2 - coins_text.get_width() // 2 - 30, 140), 15)
-            screen.blit(coins_text, (SCREEN_WIDTH // 2 - coins_text.get_width() // 2, 120))
-            
-            font = pygame.font.SysFont("Arial", 30, bold=True)
-            skins_label = font.render("SKINS", True, (50, 50, 150))
-            screen.blit(skins_label, (150, 120))
-            
-            trails_label = font.render("TRAILS", True, (50, 50, 150))
-            screen.blit(trails_label, (150, 320))
-            
-            pygame.draw.rect(screen, (255, 255, 255, 150), (100, 150, 800, 150), border_radius=15)
-            pygame.draw.rect(screen, (255, 255, 255, 150), (100, 350, 800, 150), border_radius=15)
-            
-            for item in self.shop_items:
-                item.draw(screen, self.player.skins)
-            
-            self.save_button.draw(screen)
-            self.back_button.draw(screen)
-            
-            if hasattr(self, 'show_saved_message') and self.show_saved_message:
-                current_time = pygame.time.get_ticks()
-                if current_time - self.saved_message_timer < 2000:
-                    font = pygame.font.SysFont("Arial", 30, bold=True)
-                    saved_text = font.render("Saved!", True, GREEN)
-                    screen.blit(saved_text, (SCREEN_WIDTH // 2 - saved_text.get_width() // 2, 520))
-                else:
-                    self.show_saved_message = False
-        
+            self.draw_shop()
         elif self.state == "game_over":
-            overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 200))
-            screen.blit(overlay, (0, 0))
-            
-            game_over_font = pygame.font.SysFont("Arial", 80, bold=True)
-            game_over_text = game_over_font.render("GAME OVER", True, (255, 100, 100))
-            screen.blit(game_over_text, (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, SCREEN_HEIGHT // 2 - 150))
-            
-            score_font = pygame.font.SysFont("Arial", 50)
-            score_text = score_font.render(f"Score: {self.score}", True, WHITE)
-            screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
-            
-            coins_text = score_font.render(f"Total Coins: {self.total_coins}", True, GOLD)
-            screen.blit(coins_text, (SCREEN_WIDTH // 2 - coins_text.get_width() // 2, SCREEN_HEIGHT // 2 + 20))
-            
-            restart_font = pygame.font.SysFont("Arial", 30)
-            restart_text = restart_font.render("Click or press ENTER to restart", True, WHITE)
-            screen.blit(restart_text, (SCREEN_WIDTH // 2 - restart_text.get_width() // 2, SCREEN_HEIGHT // 2 + 120))
+            self.draw_game_over()
+    
+    def draw_background(self):
+        screen.blit(self.background.background(self.state, screen.get_size()), (0, 0))
+    
+    def draw_clouds(self, scroll):
+        if quality.settings["clouds"]:
+            self.clouds.draw(screen, scroll)
+    
+    def draw_platforms(self, scroll, alpha):
+        for platform in self.platform_index.query_band(int(scroll[1]) - 10, int(scroll[1]) + SCREEN_HEIGHT + 1):
+            platform.draw(screen, scroll, alpha)
+    
+    def draw_coins(self, scroll):
+        self.coins.draw(screen, scroll, pygame.time.get_ticks())
+    
+    def draw_player(self, scroll, alpha):
+        self.player.draw(screen, scroll, alpha)
+    
+    def draw_hud(self):
+        score_text = self.score_label.render(f"Score: {self.score}")
+        pygame.draw.rect(screen, (255, 255, 255, 150), (15, 15, score_text.get_width() + 10, score_text.get_height() + 10), border_radius=5)
+        screen.blit(score_text, (20, 20))
+        
+        coins_text = self.coins_label.render(f"Coins: {self.total_coins}")
+        pygame.draw.rect(screen, (255, 255, 255, 150), (15, 55, coins_text.get_width() + 10, coins_text.get_height() + 10), border_radius=5)
+        screen.blit(coins_text, (20, 60))
+    
+    def draw_menu(self):
+        self.draw_clouds((0, 0))
+        
+        screen.blit(self.background.menu_foreground(screen.get_size()), (0, 0))
+        
+        self.play_button.draw(screen)
+        self.shop_button.draw(screen)
+        self.quit_button.draw(screen)
+    
+    def draw_shop(self):
+        coins_text = self.shop_coins_label.render(f"Coins: {self.total_coins}")
+        pygame.draw.circle(screen, GOLD, (SCREEN_WIDTH // 2 - coins_text.get_width() // 2 - 30, 140), 15)
+        screen.blit(coins_text, (SCREEN_WIDTH // 2 - coins_text.get_width() // 2, 120))
+        
+        ticks = pygame.time.get_ticks()
+        self.drawn_preview_frame = ShopItem.preview_frame(ticks)
+        for item in self.shop_items:
+            item.draw(screen, ticks)
+        
+        self.save_button.draw(screen)
+        self.back_button.draw(screen)
+        
+        if self.show_saved_message:
+            current_time = pygame.time.get_ticks()
+            if current_time - self.saved_message_timer < 2000:
+                saved_text = text_cache.render("Saved!", 30, GREEN, bold=True)
+                screen.blit(saved_text, (SCREEN_WIDTH // 2 - saved_text.get_width() // 2, 520))
+            else:
+                self.show_saved_message = False
+    
+    def draw_game_over(self):
+        score_text = self.final_score_label.render(f"Score: {self.score}")
+        screen.blit(score_text, (SCREEN_WIDTH // 2 - score_text.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
+        
+        coins_text = self.final_coins_label.render(f"Total Coins: {self.total_coins}")
+        screen.blit(coins_text, (SCREEN_WIDTH // 2 - coins_text.get_width() // 2, SCREEN_HEIGHT // 2 + 20))
 
 async def main():
+    init_display()
+    startup.mark("display")
     game = Game()
-    running = True
+    startup.mark("game")
+    stepper = FixedStep(SIM_HZ)
+    prefetch = asyncio.ensure_future(prefetch_level(game))
+    saver = asyncio.ensure_future(game.profile.run())
+    submitter = asyncio.ensure_future(game.leaderboard.run())
+    warmer = None
+    redrawn = True
     
-    while running:
-        clock.tick(FPS)
-        
-        running = game.handle_events()
-        game.update()
-        game.draw()
-        
-        pygame.display.flip()
-        await asyncio.sleep(0)
+    try:
+        while True:
+            # Static screens tick slowly until something invalidates them
+            frame_ms = interval_ms = clock.tick(FPS if redrawn else IDLE_FPS)
+            frame_start = time.perf_counter()
+            if not redrawn:
+                # Time spent idling on a static screen isn't simulation time
+                frame_ms = min(frame_ms, stepper.step_ms)
+            
+            if not game.handle_events():
+                break
+            for _ in range(stepper.advance(frame_ms)):
+                game.update()
+            
+            redrawn = game.needs_redraw()
+            if redrawn:
+                game.draw(stepper.alpha)
+                if recorder.enabled:
+                    if profiler.enabled:
+                        profiler.run("capture", recorder.capture, screen)
+                    else:
+                        recorder.capture(screen)
+                if profiler.enabled:
+                    profiler.draw_overlay(screen)
+                    profiler.run("flip", pygame.display.flip)
+                    profiler.end_frame()
+                else:
+                    pygame.display.flip()
+                if game.state == "playing":
+                    quality.observe(interval_ms, (time.perf_counter() - frame_start) * 1000)
+            if warmer is None:
+                # The menu is on screen and taking input: that's the first interactive frame
+                print(f"Startup: first interactive frame after {startup.mark('first_frame'):.0f} ms "
+                      f"({startup.summary()})")
+                signal_ready()
+                warmer = asyncio.ensure_future(warm_assets(game))
+            await asyncio.sleep(0)
+    finally:
+        prefetch.cancel()
+        if recorder.enabled:
+            recorder.stop()
+        if warmer is not None:
+            warmer.cancel()
+        saver.cancel()
+        submitter.cancel()
+        # Player data still waiting on the debounce is written before the window goes
+        game.profile.flush()
+        pygame.quit()
 
 # Web entry point
 if __name__ == "__main__":